@@ -0,0 +1,76 @@
+"""
+Parse-time benchmark for the Airflow DAG files.
+
+Each DAG file is imported in a fresh interpreter, the way the scheduler's
+DAG processor does it, with Airflow itself already imported so only the cost
+of the DAG module is measured. The run fails when the median import time
+exceeds the budget or when a heavy pipeline dependency gets imported.
+
+    python benchmarks/dag_parse_time.py --budget_ms 500 --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parents[1]
+DAGS_DIR = parent_dir / "dags"
+
+# Modules that must only be imported inside a running task
+HEAVY_MODULES = ["evidently", "darts", "catboost", "mlflow", "great_expectations", "torch", "requests_cache"]
+
+PROBE = """
+import sys, time, json, importlib.util
+import airflow
+from airflow import DAG
+path = sys.argv[1]
+heavy = json.loads(sys.argv[2])
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("dag_under_test", path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "heavy": [name for name in heavy if name in sys.modules]}))
+"""
+
+
+def measure_dag_file(path: Path, repeat: int):
+    """Import a DAG file `repeat` times in fresh interpreters."""
+    timings, heavy = [], set()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(parent_dir), os.getenv("PYTHONPATH")]))}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, str(path), json.dumps(HEAVY_MODULES)],
+            capture_output=True, text=True, check=True, env=env,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return {"median_ms": 1000 * statistics.median(timings), "max_ms": 1000 * max(timings), "heavy_modules": sorted(heavy)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the DAG files.")
+    parser.add_argument("--budget_ms", type=float, default=float(os.getenv("DAG_PARSE_BUDGET_MS", "500")))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("dag_files", nargs="*", help="DAG files to check, defaults to every file in dags/.")
+    args = parser.parse_args()
+
+    dag_files = [Path(path) for path in args.dag_files] or sorted(DAGS_DIR.glob("*.py"))
+    failed = False
+    for path in dag_files:
+        result = measure_dag_file(path, args.repeat)
+        over_budget = result["median_ms"] > args.budget_ms
+        failed |= over_budget or bool(result["heavy_modules"])
+        status = "FAIL" if over_budget or result["heavy_modules"] else "OK"
+        print(f"[{status}] {path.name}: median {result['median_ms']:.1f} ms, max {result['max_ms']:.1f} ms "
+              f"(budget {args.budget_ms:.0f} ms), heavy modules: {result['heavy_modules'] or 'none'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Round trip of a decoded Open-Meteo response through the Arrow hand-off.
+
+Decodes a fake response carrying Open-Meteo's float32 arrays, writes it as
+the fetch task does (CSV and Arrow copy), reads the Arrow file back as the
+downstream tasks do and validates it against the weather suite. Also checks
+the hand-off has the same dtypes as the CSV path. Exits 1 on any failure.
+
+    python benchmarks/handoff_check.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+parent_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "includes" / "DataIngestion"))
+
+from synthetic_data import generate_weather_frame, FakeOpenMeteoResponse
+
+
+def check_roundtrip(years=2):
+    from compiled_validation import validate_dataframe
+    from includes.DataIngestion.scrape_data import _decode_daily
+    from shared.dataset_handoff import write_dataset, read_dataset
+
+    decoded = _decode_daily(FakeOpenMeteoResponse(generate_weather_frame(years)))
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = Path(tmp_dir) / "weather_data.csv"
+        decoded.to_csv(csv_path)
+        dataset = write_dataset(decoded, tmp_dir, filename="weather_data.arrow")
+        handed_off = read_dataset(Path(tmp_dir) / dataset["filename"], dataset["content_hash"])
+        from_csv = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+
+    mismatched = {col: (str(handed_off[col].dtype), str(from_csv[col].dtype))
+                  for col in from_csv.columns if handed_off[col].dtype != from_csv[col].dtype}
+    if mismatched:
+        problems.append(f"hand-off dtypes differ from the CSV path: {mismatched}")
+
+    results = validate_dataframe(handed_off.reset_index())
+    for result in results["results"]:
+        if not result["success"]:
+            problems.append(f"{result['expectation_config']['type']} failed on "
+                            f"{result['expectation_config']['kwargs'].get('column')}: {result['result']}")
+    return problems
+
+
+if __name__ == "__main__":
+    problems = check_roundtrip()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Decoded response survives the Arrow hand-off and passes the suite.")
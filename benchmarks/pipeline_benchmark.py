@@ -0,0 +1,347 @@
+"""
+Pipeline benchmark on synthetic data.
+
+Times and memory-profiles each subsystem (ingestion decode, feature building,
+cold and daily validation, training, prediction and drift detection) on
+synthetic datasets of `--years` years for `--locations` locations. Everything
+runs offline on CPU: Open-Meteo responses are faked and no MLflow or
+Evidently server is contacted.
+
+Results are written to benchmarks/baselines/<name>.json with --save and
+compared to the stored baseline otherwise; the run fails when a subsystem
+got slower or more memory hungry than the tolerance allows.
+
+    python benchmarks/pipeline_benchmark.py --years 10 --locations 3 --save
+    python benchmarks/pipeline_benchmark.py --years 10 --locations 3
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+parent_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(parent_dir))
+# The validation and monitoring modules import their siblings directly
+sys.path.append(str(parent_dir / "includes" / "DataIngestion"))
+sys.path.append(str(parent_dir / "includes" / "Monitoring"))
+
+from synthetic_data import generate_dataset, stack_locations, FakeOpenMeteoResponse
+
+BASELINES_PATH = parent_dir / "benchmarks" / "baselines"
+# Metrics compared to the baseline, lower is better for all of them
+COMPARED_METRICS = ["wall_seconds", "tracemalloc_peak_mb", "child_peak_rss_mb"]
+# Subsystems whose work runs in worker processes, tracemalloc only sees the parent
+WORKER_SUBSYSTEMS = {"drift"}
+
+
+# ---------------------
+# Subsystems
+# ---------------------
+# Each benchmark is a setup, excluded from the measures, returning the
+# arguments of the measured function.
+
+def setup_ingestion_decode(frames, context):
+    return [FakeOpenMeteoResponse(frame) for frame in frames.values()],
+
+
+def run_ingestion_decode(responses):
+    from includes.DataIngestion.scrape_data import _decode_daily
+    return sum(len(_decode_daily(response)) for response in responses)
+
+
+def setup_feature_building(frames, context):
+    return frames,
+
+
+def run_feature_building(frames):
+    from darts import TimeSeries
+    from includes.Training.train import prepare_features, params
+
+    rows = 0
+    for frame in frames.values():
+        features = prepare_features(frame.copy())
+        TimeSeries.from_dataframe(features, value_cols=[params["target"]])
+        TimeSeries.from_dataframe(features, value_cols=params["past_covariates"])
+        rows += len(features)
+    return rows
+
+
+def _decoded_frames(frames, context):
+    """Frames decoded from fake Open-Meteo responses, with their float32 arrays, as the fetch hands them off."""
+    if "decoded" not in context:
+        from includes.DataIngestion.scrape_data import _decode_daily
+
+        context["decoded"] = {location: _decode_daily(FakeOpenMeteoResponse(frame)).reset_index()
+                              for location, frame in frames.items()}
+    return context["decoded"]
+
+
+def _validate_frames(frames, cache_dir):
+    # The default incremental path of the validation tasks
+    import validate_data
+
+    validate_data.VALIDATION_CACHE_DIR = Path(cache_dir)
+    for location, frame in frames.items():
+        validate_data.validate_frame(frame, cache_dir, location=location)
+    return sum(len(frame) for frame in frames.values())
+
+
+def setup_validation_cold(frames, context):
+    import tempfile
+
+    context["validation_cold"] = tempfile.TemporaryDirectory()
+    return _decoded_frames(frames, context), context["validation_cold"].name
+
+
+def run_validation_cold(frames, root):
+    import tempfile
+
+    # An empty cache every run: the first run of a location, or after a suite change
+    return _validate_frames(frames, tempfile.mkdtemp(dir=root))
+
+
+def setup_validation_daily(frames, context):
+    """
+    The cache is warmed without the last days, then each run adds one day,
+    as the daily DAG run does: only the last month is validated again.
+    """
+    import tempfile
+
+    decoded = _decoded_frames(frames, context)
+    context["validation_daily"] = tempfile.TemporaryDirectory()
+    # One held back day per measured run, and one for the traced run
+    held_back = context["repeat"] + 1
+    state = {"days": 0}
+    _validate_frames({location: frame.iloc[:-held_back] for location, frame in decoded.items()},
+                     context["validation_daily"].name)
+    return decoded, held_back, state, context["validation_daily"].name
+
+
+def run_validation_daily(frames, held_back, state, cache_dir):
+    state["days"] = min(state["days"] + 1, held_back)
+    return _validate_frames({location: frame.iloc[:len(frame) - held_back + state["days"]]
+                             for location, frame in frames.items()}, cache_dir)
+
+
+def _training_inputs(frames, context):
+    """Features and series of every location, built once per benchmark run."""
+    if "series" not in context:
+        from darts import TimeSeries
+        from includes.Training.train import prepare_features, params
+
+        context["series"] = {}
+        for location, frame in frames.items():
+            features = prepare_features(frame.copy())
+            context["series"][location] = (
+                TimeSeries.from_dataframe(features, value_cols=[params["target"]]),
+                TimeSeries.from_dataframe(features, value_cols=params["past_covariates"]),
+            )
+    return context["series"]
+
+
+def setup_training(frames, context):
+    return _training_inputs(frames, context), context
+
+
+def run_training(series, context):
+    from includes.Training.train import build_model, params
+
+    benchmark_params = {**params, "n_estimators": context["n_estimators"]}
+    context["models"] = {}
+    for location, (rain_series, past_covariates) in series.items():
+        model = build_model(benchmark_params)
+        model.fit(rain_series, past_covariates=past_covariates)
+        context["models"][location] = model
+    return sum(len(rain_series) for rain_series, _ in series.values())
+
+
+def setup_prediction(frames, context):
+    if "models" not in context:
+        run_training(_training_inputs(frames, context), context)
+    return context["series"], context["models"], context["origins"]
+
+
+def run_prediction(series, models, origins):
+    # Same call as safe_predict_with_model, over the last `origins` days
+    predictions = 0
+    for location, (rain_series, past_covariates) in series.items():
+        for origin in range(len(rain_series) - origins, len(rain_series)):
+            models[location].predict(7, series=rain_series[:origin], past_covariates=past_covariates)
+            predictions += 1
+    return predictions
+
+
+def setup_drift(frames, context):
+    # Reference and current halves of every location, as monitor_drift compares them
+    before = stack_locations({location: frame.iloc[:len(frame) // 2] for location, frame in frames.items()})
+    after = stack_locations({location: frame.iloc[len(frame) // 2:] for location, frame in frames.items()})
+    return before.reset_index(drop=True), after.reset_index(drop=True)
+
+
+def run_drift(before, after):
+    from parallel_drift import parallel_drift_report
+
+    report = parallel_drift_report(before, after, location_col="location")
+    return report["number_of_columns"]
+
+
+SUBSYSTEMS = {
+    "ingestion_decode": (setup_ingestion_decode, run_ingestion_decode),
+    "feature_building": (setup_feature_building, run_feature_building),
+    "validation_cold": (setup_validation_cold, run_validation_cold),
+    "validation_daily": (setup_validation_daily, run_validation_daily),
+    "training": (setup_training, run_training),
+    "prediction": (setup_prediction, run_prediction),
+    "drift": (setup_drift, run_drift),
+}
+
+
+# ---------------------
+# Measures
+# ---------------------
+
+def _peak_rss_mb(who=None):
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss / 1024
+
+
+def measure(func, args, repeat, workers=False):
+    """
+    Median wall and CPU time over `repeat` runs, then one traced run for the memory peak.
+
+    With `workers`, the work runs in child processes: the tracemalloc peak is
+    not measured and the peak RSS of the children is reported instead.
+    """
+    import resource
+
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        items = func(*args)
+        walls.append(time.perf_counter() - wall_start)
+        cpus.append(time.process_time() - cpu_start)
+
+    if workers:
+        peak = None
+    else:
+        # tracemalloc slows allocations down, so memory is measured apart
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "wall_seconds": statistics.median(walls),
+        "wall_seconds_min": min(walls),
+        "cpu_seconds": statistics.median(cpus),
+        "tracemalloc_peak_mb": None if peak is None else peak / (1024 * 1024),
+        "peak_rss_mb": _peak_rss_mb(),
+        # Largest child process so far, the workers of this subsystem when it has any
+        "child_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if workers else None,
+        "items": items,
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def run_benchmarks(years, n_locations, subsystems=None, repeat=3, n_estimators=100, origins=30, seed=0):
+    frames = generate_dataset(years, n_locations, seed=seed)
+    context = {"n_estimators": n_estimators, "origins": origins, "repeat": repeat}
+    results = {}
+    for name in subsystems or SUBSYSTEMS:
+        setup, run = SUBSYSTEMS[name]
+        args = setup(frames, context)
+        results[name] = measure(run, args, repeat, workers=name in WORKER_SUBSYSTEMS)
+        memory = (f"traced peak {results[name]['tracemalloc_peak_mb']:8.1f} MB"
+                  if results[name]["tracemalloc_peak_mb"] is not None
+                  else f"child peak RSS {results[name]['child_peak_rss_mb']:8.1f} MB")
+        print(f"{name:<18} median {results[name]['wall_seconds']:8.3f} s, "
+              f"cpu {results[name]['cpu_seconds']:8.3f} s, {memory}")
+
+    return {
+        "config": {"years": years, "locations": n_locations, "repeat": repeat,
+                   "n_estimators": n_estimators, "origins": origins, "seed": seed},
+        "environment": environment(),
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Regressions of `current` against `baseline`, as readable lines."""
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        for metric in COMPARED_METRICS:
+            # Not measured for this subsystem, e.g. the tracemalloc peak of worker processes
+            if not reference.get(metric) or result.get(metric) is None:
+                continue
+            ratio = result[metric] / reference[metric]
+            marker = "REGRESSION" if ratio > 1 + tolerance else "ok"
+            print(f"  {name:<18} {metric:<20} {reference[metric]:10.3f} -> {result[metric]:10.3f} "
+                  f"({ratio - 1:+.1%}) {marker}")
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name} {metric} {ratio - 1:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline subsystems on synthetic data.")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--n_estimators", type=int, default=100,
+                        help="Boosting rounds of the benchmark model, the production value is in train.params.")
+    parser.add_argument("--origins", type=int, default=30, help="Forecast origins predicted per location.")
+    parser.add_argument("--subsystems", nargs="*", choices=list(SUBSYSTEMS), default=None)
+    parser.add_argument("--name", default=None, help="Baseline name, defaults to <years>y_<locations>loc.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing.")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline.")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.years, args.locations, args.subsystems, args.repeat,
+                             args.n_estimators, args.origins)
+    baseline_path = BASELINES_PATH / f"{args.name or f'{args.years}y_{args.locations}loc'}.json"
+
+    if args.save:
+        BASELINES_PATH.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    if not baseline_path.is_file():
+        print(f"No baseline at {baseline_path}, run with --save to create it.")
+        return
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["config"] != current["config"]:
+        print(f"⚠️ Baseline config {baseline['config']} differs from {current['config']}.")
+    print(f"Comparison with {baseline_path.name} ({baseline['created_at']}):")
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
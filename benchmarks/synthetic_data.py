@@ -0,0 +1,126 @@
+"""
+Synthetic weather data for the benchmarks.
+
+Frames have the exact schema `get_weather_data` returns (UTC daily index
+named `date`, same columns, float64 like the stored datasets) and respect the suite's cross-column
+rules, so every pipeline stage can run on them offline at any scale.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.locations import location_slugs
+
+# Same order as the daily variables decoded by scrape_data._decode_daily
+DAILY_COLUMNS = [
+    "temperature_2m_max (°C)",
+    "temperature_2m_min (°C)",
+    "temperature_2m_mean (°C)",
+    "rain_sum (mm)",
+    "relative_humidity_2m_max (%)",
+    "relative_humidity_2m_min (%)",
+    "wind_speed_10m_max (m/s)",
+    "wind_speed_10m_min (m/s)",
+    "wind_speed_10m_mean (m/s)",
+    "relative_humidity_2m_mean (%)",
+    "cloudcover_mean (%)",
+    "surface_pressure_mean (hPa)",
+    "precipitation_hours",
+]
+
+
+def benchmark_locations(n_locations):
+    """The first `n_locations` registered locations, padded with synthetic ones."""
+    slugs = location_slugs()[:n_locations]
+    return slugs + [f"synthetic_{i}" for i in range(len(slugs), n_locations)]
+
+
+def generate_weather_frame(years=2, end_date="2025-01-01", seed=0):
+    """One location's daily weather over `years` years, ending the day before `end_date`."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end=pd.Timestamp(end_date, tz="UTC") - pd.Timedelta(days=1),
+                          periods=int(round(365.25 * years)), freq="D", name="date")
+    n = len(index)
+    season = np.sin(2 * np.pi * index.dayofyear.to_numpy() / 365.25)
+
+    temperature_mean = 26 + 2.5 * season + rng.normal(0, 1.0, n)
+    temperature_spread = rng.uniform(3, 8, n)
+    humidity_mean = np.clip(78 + 8 * season + rng.normal(0, 5, n), 20, 95)
+    humidity_spread = rng.uniform(5, 20, n)
+    wind_mean = rng.gamma(4, 0.6, n)
+    wind_spread = rng.uniform(0.3, 2.0, n)
+
+    # Rainy season driven by the seasonal cycle, dry days have no precipitation hours
+    rainy = rng.random(n) < 0.35 + 0.25 * season
+    precipitation_hours = np.where(rainy, rng.integers(1, 24, n), 0)
+    rain_sum = np.where(rainy, rng.gamma(0.8, 8.0, n), 0.0)
+
+    frame = pd.DataFrame({
+        "temperature_2m_max (°C)": temperature_mean + temperature_spread / 2,
+        "temperature_2m_min (°C)": temperature_mean - temperature_spread / 2,
+        "temperature_2m_mean (°C)": temperature_mean,
+        "rain_sum (mm)": rain_sum,
+        "relative_humidity_2m_max (%)": np.minimum(humidity_mean + humidity_spread / 2, 100),
+        "relative_humidity_2m_min (%)": humidity_mean - humidity_spread / 2,
+        "wind_speed_10m_max (m/s)": wind_mean + wind_spread,
+        "wind_speed_10m_min (m/s)": np.maximum(wind_mean - wind_spread, 0),
+        "wind_speed_10m_mean (m/s)": wind_mean,
+        "relative_humidity_2m_mean (%)": humidity_mean,
+        "cloudcover_mean (%)": np.clip(40 + 40 * rainy + rng.normal(0, 10, n), 0, 100),
+        "surface_pressure_mean (hPa)": 1005 - 2 * season + rng.normal(0, 1.5, n),
+        "precipitation_hours": precipitation_hours,
+    }, index=index)
+    return frame.astype(np.float64)
+
+
+def generate_dataset(years=2, n_locations=1, end_date="2025-01-01", seed=0):
+    """One frame per location, keyed by location slug."""
+    return {
+        location: generate_weather_frame(years, end_date, seed=seed + i)
+        for i, location in enumerate(benchmark_locations(n_locations))
+    }
+
+
+def stack_locations(frames):
+    """Long frame of every location, with the `location` column the validators group on."""
+    return pd.concat([frame.assign(location=location) for location, frame in frames.items()])
+
+
+class _FakeVariable:
+    def __init__(self, values):
+        self._values = values
+
+    def ValuesAsNumpy(self):
+        return self._values
+
+
+class _FakeDaily:
+    def __init__(self, frame):
+        self._frame = frame
+        # Open-Meteo sends float32 values
+        self._values = [frame[col].to_numpy(dtype=np.float32) for col in DAILY_COLUMNS]
+
+    def Time(self):
+        return int(self._frame.index[0].timestamp())
+
+    def TimeEnd(self):
+        return int(self._frame.index[-1].timestamp()) + self.Interval()
+
+    def Interval(self):
+        return 86400
+
+    def Variables(self, i):
+        return _FakeVariable(self._values[i])
+
+
+class FakeOpenMeteoResponse:
+    """Stands in for an Open-Meteo response so the decoding runs without network access."""
+
+    def __init__(self, frame):
+        self._daily = _FakeDaily(frame)
+
+    def Daily(self):
+        return self._daily
@@ -8,17 +8,9 @@ from dotenv import load_dotenv
 
 from airflow import DAG
 from airflow.operators.python import PythonOperator, BranchPythonOperator
-from airflow.operators.bash import BashOperator
 from airflow.operators.empty import EmptyOperator
 from airflow.providers.slack.operators.slack import SlackAPIPostOperator
 
-from includes.DataIngestion.scrape_data import get_weather_data
-from includes.DataIngestion.ge_setup import setup_expectations
-from includes.DataIngestion.validate_data import run_validation
-from includes.Monitoring.monitor import monitor_drift
-from includes.Training.train import train_and_log_model
-from includes.Callbacks.alert import task_failure_alert
-
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -28,10 +20,86 @@ load_dotenv()
 DATA_DIR = os.getenv("DATA_PATH")
 EXPECTATIONS_PATH = os.getenv("EXPECTATIONS_PATH")
 
+# Daily aggregates of hourly data as extra covariates
+USE_HOURLY_FEATURES = os.getenv("USE_HOURLY_FEATURES", "0") == "1"
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ---------------------
+# Task callables
+# ---------------------
+# The pipeline modules pull in evidently, darts, catboost, mlflow and
+# great_expectations and open connections at import, so they are only
+# imported when a task runs, never when the scheduler parses this file.
+def monitor_drift(**kwargs):
+    from includes.Monitoring.monitor import monitor_drift
+    return monitor_drift(**kwargs)
+
+def get_weather_data(**kwargs):
+    from includes.DataIngestion.scrape_data import get_weather_data
+    return get_weather_data(**kwargs)
+
+def get_hourly_features(**kwargs):
+    from includes.DataIngestion.hourly_features import get_hourly_features
+    return get_hourly_features(**kwargs)
+
+def setup_expectations(**kwargs):
+    from includes.DataIngestion.ge_setup import setup_expectations
+    return setup_expectations(**kwargs)
+
+# DataVersioning, DataValidation and ModelTraining are skipped when the hash
+# of their input data and config matches their last successful run.
+def version_data(**kwargs):
+    from includes.Caching.stage_cache import run_cached
+    from includes.DataVersioning.partitions import version_partitions
+    from shared.observation_buffer import update_observation_buffer
+    from shared.dataset_handoff import handed_off_path, read_dataset, DATA_PATH
+
+    dataset_path, dataset_hash = handed_off_path(kwargs["ti"])
+    result = run_cached("DataVersioning", lambda: version_partitions(read_dataset(dataset_path, dataset_hash)),
+                        inputs=[dataset_path], config={"versioning": "monthly_partitions"}, ti=kwargs["ti"])
+    # Only the days this fetch brought go through feature preparation
+    update_observation_buffer(read_dataset(dataset_path, dataset_hash), DATA_PATH)
+    return result
+
+def run_validation(**kwargs):
+    from includes.Caching.stage_cache import run_cached
+    from includes.DataIngestion.validate_data import run_validation, VALIDATION_ENGINE
+    from includes.DataIngestion.weather_suite import suite_version
+    from shared.dataset_handoff import handed_off_path
+
+    dataset_path, _ = handed_off_path(kwargs["ti"])
+    config = {"suite_version": suite_version(), "engine": VALIDATION_ENGINE}
+    return run_cached("DataValidation", lambda: run_validation(**kwargs),
+                      inputs=[dataset_path], config=config, ti=kwargs["ti"])
+
+def train_and_log_model(**kwargs):
+    from includes.Caching.stage_cache import run_cached
+    from includes.Training.train import train_and_log_model, params
+    from shared.data_snapshot import training_inputs
+    from shared.dataset_handoff import handed_off_path, DATA_PATH
+
+    dataset_path, dataset_hash = handed_off_path(kwargs["ti"])
+
+    def train():
+        import mlflow
+        train_and_log_model(dataset_path=dataset_path, dataset_hash=dataset_hash)
+        return {"run_id": mlflow.last_active_run().info.run_id}
+
+    # The hourly features are joined at training, a backfill of them retrains too
+    return run_cached("ModelTraining", train, inputs=training_inputs(dataset_path, DATA_PATH),
+                      config=params, ti=kwargs["ti"])
+
+def materialise_forecasts(**kwargs):
+    from includes.Forecasting.materialise_forecasts import materialise_forecasts
+    return materialise_forecasts(**kwargs)
+
+def task_failure_alert(context):
+    from includes.Callbacks.alert import task_failure_alert
+    return task_failure_alert(context)
+
 # ---------------------
 # Branching functions
 # ---------------------
@@ -40,7 +108,7 @@ def check_model_decay(**kwargs):
     ti = kwargs["ti"]
     decay_result = ti.xcom_pull(
         task_ids="MonitorModelDecay",
-        key="MonitorModelDecay"
+        key="model_decay_test_result"
     )
 
     # SUCCESS means NO decay → continue; otherwise → alert Slack & retrain
@@ -76,20 +144,20 @@ with DAG(
     },
 ) as dag:
 
-    # 1. Monitor model drift/decay
+    # 5. Monitor model drift/decay, on the snapshot the new days were versioned into
     model_monitoring_task = PythonOperator(
         task_id="MonitorModelDecay",
         python_callable=monitor_drift,
         provide_context=True
     )
 
-    # 2. Decide branch based on decay result
+    # 6. Decide branch based on decay result
     check_model_decay_task = BranchPythonOperator(
         task_id="IsModelDecay?",
         python_callable=check_model_decay,
     )
 
-    # 3. Slack alert if decay detected
+    # 7. Slack alert if decay detected
     alert_slack_task = SlackAPIPostOperator(
         task_id='notify_slack_model_decay',
         slack_conn_id='slack_default',
@@ -102,7 +170,7 @@ with DAG(
         username="airflow-bot"
     )
 
-    # 4. Fetch new data
+    # 1. Fetch new data
     fetch_data_task = PythonOperator(
         task_id="DataFetching",
         python_callable=get_weather_data,
@@ -114,13 +182,24 @@ with DAG(
         provide_context=True
     )
 
-    # 5. Version data with DVC
-    version_data_task = BashOperator(
+    # 1b. Aggregate hourly data into daily features
+    if USE_HOURLY_FEATURES:
+        hourly_features_task = PythonOperator(
+            task_id="HourlyFeatures",
+            python_callable=get_hourly_features,
+            op_kwargs={
+                "start_date": datetime.now() - relativedelta(years=2),
+                "end_date": datetime.now(),
+            },
+        )
+
+    # 2. Version data with DVC
+    version_data_task = PythonOperator(
         task_id='DataVersioning',
-        bash_command=f"dvc add {DATA_DIR}/weather_data.csv"
+        python_callable=version_data,
     )
 
-    # 6. Check expectations existence
+    # 3. Check expectations existence
     check_expectation_existence_task = BranchPythonOperator(
         task_id="CheckExpectationExistence",
         python_callable=check_expectation_existence,
@@ -135,7 +214,7 @@ with DAG(
 
     skip_step = EmptyOperator(task_id="SkipStep")
 
-    # 7. Validate data
+    # 4. Validate data
     validate_data_task = PythonOperator(
         task_id="DataValidation",
         python_callable=run_validation,
@@ -155,14 +234,27 @@ with DAG(
     # 9. Stop DAG if no decay
     stop_dag = EmptyOperator(task_id="stop_dag")
 
+    # 10. Store the 7-day forecast served by the frontend, refreshed on every run
+    materialise_forecasts_task = PythonOperator(
+        task_id="MaterialiseForecasts",
+        python_callable=materialise_forecasts,
+        trigger_rule="none_failed_min_one_success"
+    )
+
     # ---------------------
     # Task Dependencies
     # ---------------------
-    model_monitoring_task >> check_model_decay_task
-    check_model_decay_task >> alert_slack_task >> fetch_data_task
-    check_model_decay_task >> stop_dag
-
+    # New data is fetched, versioned and validated on every run, so monitoring
+    # compares the model with the days after its cut-off
     fetch_data_task >> version_data_task
     version_data_task >> check_expectation_existence_task
     check_expectation_existence_task >> [create_expectation_suite, skip_step] >> validate_data_task
-    validate_data_task >> train_model_task
+    validate_data_task >> model_monitoring_task
+    if USE_HOURLY_FEATURES:
+        # The observation buffer is updated at versioning, with the hourly aggregates of the new days
+        fetch_data_task >> hourly_features_task >> version_data_task
+
+    model_monitoring_task >> check_model_decay_task
+    check_model_decay_task >> alert_slack_task >> train_model_task
+    check_model_decay_task >> stop_dag
+    [train_model_task, stop_dag] >> materialise_forecasts_task
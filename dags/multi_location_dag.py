@@ -0,0 +1,203 @@
+import os
+import sys
+import logging
+from pathlib import Path
+from dateutil.relativedelta import relativedelta
+import pendulum
+from dotenv import load_dotenv
+
+from airflow import DAG
+from airflow.decorators import task
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+load_dotenv()
+
+# Paths
+EXPECTATIONS_PATH = os.getenv("EXPECTATIONS_PATH")
+
+# Per-location tasks share a pool and a concurrency cap, so adding a city
+# adds parallel work without overloading the workers.
+# Create the pool with: airflow pools set weather_locations 4 "Per-location pipeline tasks"
+LOCATION_POOL = os.getenv("LOCATION_POOL", "weather_locations")
+LOCATION_CONCURRENCY = int(os.getenv("LOCATION_CONCURRENCY", "4"))
+
+# Also train one global model over every location from a quantised pool on
+# disk, time-budgeted and resumed from its last snapshot on retry
+GLOBAL_MODEL_TRAINING = os.getenv("GLOBAL_MODEL_TRAINING", "0") == "1"
+# Daily aggregates of hourly data as extra covariates
+USE_HOURLY_FEATURES = os.getenv("USE_HOURLY_FEATURES", "0") == "1"
+
+# Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def task_failure_alert(context):
+    from includes.Callbacks.alert import task_failure_alert
+    return task_failure_alert(context)
+
+
+# ---------------------
+# DAG Definition
+# ---------------------
+with DAG(
+    "weather_multi_location_dag",
+    start_date=pendulum.datetime(2025, 5, 23, tz='local'),
+    schedule=None,
+    catchup=False,
+    max_active_tasks=2 * LOCATION_CONCURRENCY,
+    tags=["weather", "portfolio", "data_ingestion", "multi_location"],
+    on_failure_callback=task_failure_alert,
+    default_args={
+        "owner": "airflow",
+        "retries": 3,
+        "retry_delay": relativedelta(seconds=5),
+        "on_failure_callback": task_failure_alert
+    },
+) as dag:
+
+    @task
+    def list_locations():
+        """Read the location registry, each entry becomes one mapped task."""
+        from shared.locations import location_slugs
+        return location_slugs()
+
+    @task(pool=LOCATION_POOL, max_active_tis_per_dagrun=LOCATION_CONCURRENCY)
+    def monitor_location(dataset):
+        """Monitor on the snapshot the newly fetched days were just versioned into."""
+        from includes.Monitoring.monitor import monitor_drift
+        location = dataset["location"]
+        try:
+            return monitor_drift(location=location)
+        except ValueError as e:
+            # No cut-off date or no data yet: the location has never been trained
+            logger.warning(f"⚠️ No monitoring possible for {location} ({e}), scheduling a training.")
+            return {"location": location, "model_decay_test_result": None, "decay": True, "drift_share": None}
+
+    @task
+    def select_decayed(drift_results):
+        """
+        Only the locations whose model decayed go through retraining,
+        the most degraded first. Beyond RETRAIN_QUEUE_LIMIT they wait for the next run.
+        """
+        from includes.Training.retrain_scheduler import prioritise
+
+        decayed = prioritise(list(drift_results))
+        logger.info(f"Model decay detected for {decayed or 'no location'}.")
+        return decayed
+
+    @task(pool=LOCATION_POOL, max_active_tis_per_dagrun=LOCATION_CONCURRENCY)
+    def fetch_location(location):
+        from includes.DataIngestion.scrape_data import get_weather_data, save_weather_data
+
+        now = pendulum.now()
+        df = get_weather_data(start_date=(now - relativedelta(years=2)).date(), end_date=now.date(), location=location)
+        if df is None:
+            raise ValueError(f"No weather data could be fetched for {location}.")
+        if USE_HOURLY_FEATURES:
+            from includes.DataIngestion.hourly_features import get_hourly_features
+            get_hourly_features(start_date=(now - relativedelta(years=2)).date(), end_date=now.date(), location=location)
+        return save_weather_data(df, location)
+
+    @task
+    def version_datasets(datasets):
+        """DVC holds a repository lock, so versioning runs once for all locations."""
+        from includes.Caching.stage_cache import run_cached
+        from includes.DataVersioning.partitions import version_partitions
+        from shared.dataset_handoff import read_dataset, DATA_PATH
+        from shared.observation_buffer import update_observation_buffer
+
+        datasets = list(datasets)
+        for dataset in datasets:
+            dataset_path = Path(DATA_PATH) / dataset["filename"]
+            run_cached(f"DataVersioning_{dataset['location']}",
+                       lambda: version_partitions(read_dataset(dataset_path, dataset["content_hash"]),
+                                                  location=dataset["location"]),
+                       inputs=[dataset_path], config={"versioning": "monthly_partitions"})
+            update_observation_buffer(read_dataset(dataset_path, dataset["content_hash"]), DATA_PATH,
+                                      location=dataset["location"])
+        return datasets
+
+    @task(pool=LOCATION_POOL, max_active_tis_per_dagrun=LOCATION_CONCURRENCY)
+    def validate_location(dataset):
+        from includes.Caching.stage_cache import run_cached
+        from includes.DataIngestion.validate_data import validate_frame, VALIDATION_ENGINE
+        from includes.DataIngestion.weather_suite import suite_version
+        from shared.dataset_handoff import read_dataset, DATA_PATH
+
+        location = dataset["location"]
+        dataset_path = Path(DATA_PATH) / dataset["filename"]
+
+        def validate():
+            df = read_dataset(dataset_path, expected_hash=dataset["content_hash"]).reset_index()
+            return validate_frame(df, EXPECTATIONS_PATH, location=location)
+
+        config = {"suite_version": suite_version(), "engine": VALIDATION_ENGINE}
+        run_cached(f"DataValidation_{location}", validate, inputs=[dataset_path], config=config)
+        return dataset
+
+    @task
+    def retrain_locations(datasets, drift_results, decayed):
+        """
+        Retrain the validated locations through the retrain scheduler: highest
+        priority first, on a bounded process pool within the CPU and memory budgets.
+        """
+        from includes.Training.retrain_scheduler import RetrainScheduler, retrain_location
+
+        drift_by_location = {result["location"]: result for result in drift_results}
+        decayed = set(decayed)
+        scheduler = RetrainScheduler()
+        for dataset in datasets:
+            if dataset["location"] in decayed:
+                scheduler.submit(drift_by_location[dataset["location"]], job=dataset)
+        return scheduler.run(retrain_location)
+
+    @task
+    def train_global(datasets):
+        """Once new data is validated, retrain the global model over every partitioned location."""
+        import mlflow
+        from includes.Training.out_of_core import train_out_of_core
+
+        train_out_of_core()
+        return {"run_id": mlflow.last_active_run().info.run_id}
+
+    @task(trigger_rule="all_done")
+    def materialise_locations(locations):
+        """
+        Refresh the stored forecast of every location, retrained or not, in one
+        task so the locations served by the same model share a predict call.
+        Also runs when a retraining failed, the other locations still get their forecast.
+        """
+        from includes.Forecasting.materialise_forecasts import materialise_forecasts
+        return materialise_forecasts(locations=list(locations))
+
+    @task(trigger_rule="none_failed")
+    def aggregate_results(drift_results, training_results):
+        """Reduce step: one summary of drift and retraining over every location."""
+        drift_results = list(drift_results)
+        training_results = list(training_results or [])
+        drift_shares = [result["drift_share"] for result in drift_results if result.get("drift_share") is not None]
+        summary = {
+            "locations": len(drift_results),
+            "decayed_locations": [result["location"] for result in drift_results if result["decay"]],
+            "mean_drift_share": sum(drift_shares) / len(drift_shares) if drift_shares else None,
+            "retrained": {result["location"]: result["run_id"] for result in training_results},
+        }
+        logger.info(f"📊 Multi-location run summary: {summary}")
+        return summary
+
+    # ---------------------
+    # Task Dependencies
+    # ---------------------
+    locations = list_locations()
+    # Every location is fetched and versioned first, so monitoring sees the new days
+    fetched = fetch_location.expand(location=locations)
+    validated = validate_location.expand(dataset=version_datasets(fetched))
+    drift_results = monitor_location.expand(dataset=validated)
+    trained = retrain_locations(validated, drift_results, select_decayed(drift_results))
+    if GLOBAL_MODEL_TRAINING:
+        train_global(validated)
+    trained >> materialise_locations(locations)
+    aggregate_results(drift_results, trained)
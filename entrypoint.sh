@@ -1,3 +1,6 @@
 #!/bin/bash
 airflow connections import /opt/airflow/config/airflow_conns.json
+airflow pools set "${LOCATION_POOL:-weather_locations}" "${LOCATION_CONCURRENCY:-4}" "Per-location pipeline tasks"
+# Failure alerts are spooled by the tasks and delivered by this sender
+python "${AIRFLOW_HOME:-/opt/airflow}/includes/Callbacks/notifier.py" &
 exec airflow api-server
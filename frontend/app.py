@@ -1,6 +1,9 @@
 import streamlit as st
+from warmup import start_warmup
 
 st.set_page_config(page_title="Weather Forecast", layout="centered", page_icon="🌦")
+# Heavy modules and the data client load in the background while the page shell renders
+start_warmup()
 pages = {"Menu": [
         st.Page("weather_app.py", title="Main"),
         st.Page("about.py", title="About"),
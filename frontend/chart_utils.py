@@ -1,5 +1,40 @@
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+
+# Width of the chart in the centered layout, and points drawn per pixel column
+CHART_WIDTH = 700
+POINTS_PER_PIXEL = 2
+
+
+def point_budget(width=CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    """More points than the chart has pixel columns can't be seen, only sent."""
+    return int(width * points_per_pixel)
+
+
+def minmax_downsample(values, n_out):
+    """
+    Positions of the points to draw so `values` keeps its shape with at most `n_out` points.
+
+    The series is split into n_out / 2 equal buckets and the minimum and
+    maximum of each bucket are kept, so rain peaks are never smoothed away.
+    The first and last points are always kept.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = (n_out - 2) // 2
+    bucket_size = -(-n // n_buckets)
+    # Pad with the last value so the buckets reshape into a matrix
+    padded = np.pad(values, (0, n_buckets * bucket_size - n), mode="edge").reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    lows = offsets + np.argmin(padded, axis=1)
+    highs = offsets + np.argmax(padded, axis=1)
+
+    positions = np.concatenate([[0, n - 1], np.minimum(lows, n - 1), np.minimum(highs, n - 1)])
+    return np.unique(positions)
 
 
 def get_feature_evolution(data):
@@ -30,7 +65,7 @@ def get_feature_evolution(data):
 
 
 def plot_and_display_data_predictions(
-    data, rain_col="rain_sum (mm)", predicted_rain_col="predicted_rain (mm)"
+    data, rain_col="rain_sum (mm)", predicted_rain_col="predicted_rain (mm)", width=CHART_WIDTH
 ):
     """
     Plots rain levels and includes predicted rain with a dashed green transition line.
@@ -39,15 +74,18 @@ def plot_and_display_data_predictions(
     - data (pd.DataFrame): DataFrame containing rain data.
     - discharge_col (str): Column name for the rain level.
     - predicted_discharge_col (str): Column name for predicted rain.
+    - width (int): Chart width in pixels, bounds the number of observed points sent.
     """
 
     try:
         fig = go.Figure()
         
-        # Plot known river discharge levels
+        # Plot known river discharge levels, downsampled to what the chart can show
+        observed = data[rain_col].dropna()
+        observed = observed.iloc[minmax_downsample(observed.to_numpy(), point_budget(width))]
         fig.add_trace(go.Scatter(
-            x=data.index, 
-            y=data[rain_col], 
+            x=observed.index, 
+            y=observed, 
             mode='lines',
             name='Rain Level',
             line=dict(color='blue')
@@ -58,9 +96,11 @@ def plot_and_display_data_predictions(
         if predicted_rain_col in data.columns and not data[predicted_rain_col].isna().all():
             next_date = last_date + pd.Timedelta(days=1)  # Next day's timestamp
 
+            # The forecast segment is short and always drawn at full resolution
+            predicted = data[predicted_rain_col].dropna()
             fig.add_trace(go.Scatter(
-                x=data.index,
-                y=data[predicted_rain_col],
+                x=predicted.index,
+                y=predicted,
                 mode='lines+markers',
                 name='Predicted Rain',
                 line=dict(color='green', dash='dash'),
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from shared.instrumentation import record_cache_hit
+
+
+def next_utc_midnight(now=None):
+    """Open-Meteo publishes one new day at a time, so entries live until the next UTC day."""
+    now = now or datetime.now(timezone.utc)
+    return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ForecastCache:
+    """
+    Server-wide TTL cache shared by every Streamlit session.
+
+    Entries expire at the next UTC midnight by default. Concurrent misses on
+    the same key are deduplicated: the first session computes the value,
+    the others wait for it instead of sending the same API request.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, expires_at=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > datetime.now(timezone.utc):
+                self._entries.move_to_end(key)
+                record_cache_hit()
+                return entry[0]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            record_cache_hit()
+            return flight.value
+
+        record_cache_hit(hits=0, misses=1)
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # A failed or empty result is not cached, the next page load retries
+                if flight.error is None and flight.value is not None:
+                    self._entries[key] = (flight.value, expires_at or next_utc_midnight())
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,63 @@
+"""
+Import cost of the frontend, per module.
+
+Imports the given modules in a fresh interpreter with `-X importtime` and
+reports the slowest ones, so a dependency creeping back into the page's
+start-up path shows up before it reaches a pod restart.
+
+    python frontend/startup_profile.py                       # page shell and warm-up modules
+    python frontend/startup_profile.py shared.model_utils --top 15
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+frontend_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(frontend_dir, '..'))
+
+# What the page shell imports, then what the warm-up thread loads
+DEFAULT_MODULES = [
+    "streamlit",
+    "shared.instrumentation",
+    "shared.forecast_store",
+    "forecast_cache",
+    "shared.data_utils",
+    "chart_utils",
+]
+
+
+def import_times(modules):
+    """{module: (self seconds, cumulative seconds)} of every module imported by `modules`, in a fresh interpreter."""
+    code = "; ".join(f"import {name}" for name in modules)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([frontend_dir, parent_dir, os.environ.get("PYTHONPATH", "")]))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env, cwd=parent_dir)
+    if result.returncode != 0:
+        # The importtime lines come first, the traceback is at the end
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the import cost of the frontend modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=25, help="Number of slowest modules to list.")
+    args = parser.parse_args()
+
+    times = import_times(args.modules)
+    print(f"{'module':<50} {'self (s)':>10} {'cumulative (s)':>15}")
+    for name in args.modules:
+        if name in times:
+            print(f"{name:<50} {times[name][0]:>10.3f} {times[name][1]:>15.3f}")
+    print(f"\nSlowest {args.top} modules by own import time:")
+    for name, (self_s, cumulative_s) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{name:<50} {self_s:>10.3f} {cumulative_s:>15.3f}")
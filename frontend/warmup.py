@@ -0,0 +1,83 @@
+"""
+Background loading of the frontend's heavy dependencies.
+
+The page shell (title, date inputs) only needs streamlit. The data client,
+pandas/numpy feature building and plotly are imported by a warm-up thread
+started with the server, and the page waits for them with `require` only
+where it first uses them, so the first paint doesn't wait on any of them.
+"""
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logger = logging.getLogger(__name__)
+
+# Imported in this order by the warm-up thread
+WARM_MODULES = [
+    "shared.data_utils",
+    "chart_utils",
+]
+
+_timings = {}
+_ready = threading.Event()
+_started = threading.Lock()
+_thread = None
+
+
+def _warm():
+    started = time.perf_counter()
+    for name in WARM_MODULES:
+        module_started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # The page imports it again with `require` and shows the error there
+            logger.warning(f"Warm-up import of {name} failed: {e}")
+        _timings[name] = time.perf_counter() - module_started
+
+    try:
+        from includes.DataIngestion.scrape_data import get_client
+        from shared.forecast_store import load_forecast
+        client_started = time.perf_counter()
+        get_client()
+        _timings["openmeteo client"] = time.perf_counter() - client_started
+        forecast_started = time.perf_counter()
+        load_forecast()
+        _timings["stored forecast"] = time.perf_counter() - forecast_started
+    except Exception as e:
+        logger.warning(f"Warm-up of the data client failed: {e}")
+
+    _ready.set()
+    logger.info("Frontend warm-up done in %.2f s: %s", time.perf_counter() - started,
+                ", ".join(f"{name} {seconds:.2f} s" for name, seconds in _timings.items()))
+
+
+def start_warmup():
+    """Start the warm-up thread, once per process."""
+    global _thread
+    with _started:
+        if _thread is None:
+            _thread = threading.Thread(target=_warm, name="frontend-warmup", daemon=True)
+            _thread.start()
+    return _thread
+
+
+def require(name):
+    """The module `name`, waiting for the warm-up thread if it is still importing it."""
+    start_warmup()
+    # The import lock makes this wait for an import already under way in the warm-up thread
+    return importlib.import_module(name)
+
+
+def timings():
+    """Seconds spent on each warm-up step so far."""
+    return dict(_timings)
+
+
+def is_ready():
+    return _ready.is_set()
@@ -2,26 +2,43 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import logging
 import streamlit as st
-from shared.model_utils import safe_predict_with_model , persistence_forecast
-from shared.data_utils import fetch_and_prepare_data
+from shared.instrumentation import instrument_stage, instrumented
+from shared.forecast_store import load_forecast, is_stale, persistence_forecast, load_explanation, top_contributions
  
-from chart_utils import plot_and_display_data_predictions , get_feature_evolution
+from forecast_cache import ForecastCache
+from warmup import require, timings
 import datetime
 from datetime import timedelta
 
+logging.basicConfig(level=logging.INFO)
+
 st.title("🌦 Rain Forecasting App ")
 
 
+@st.cache_resource
+def get_forecast_cache():
+    # One cache for the whole server, shared by every session
+    return ForecastCache()
+
+
+forecast_cache = get_forecast_cache()
+
+
 @st.fragment(run_every="1d")
+@instrumented("App.fetch")
 def get_input(start_date, end_date):
-    data = fetch_and_prepare_data(start_date, end_date)
+    data_utils = require("shared.data_utils")
+    data = forecast_cache.get_or_compute(("data", start_date, end_date),
+                                         lambda: data_utils.fetch_and_prepare_data(start_date, end_date))
     return data
 
 @st.fragment(run_every="1d1m")
 def plot_predictions(data):
-    fig = plot_and_display_data_predictions(data)
-    st.plotly_chart(fig)
+    with instrument_stage("App.plot", rows_in=len(data)):
+        fig = require("chart_utils").plot_and_display_data_predictions(data)
+        st.plotly_chart(fig)
    
 
 col1 , col2 = st.columns(2)
@@ -38,11 +55,13 @@ end_date = col2.date_input("End date", value = today)
 end_date = end_date if end_date <= today else today
 # end_date = end_date.strftime("%Y-%m-%d")
 
-weather_df = get_input(start_date, end_date)
+# The shell above is already on screen, wait here for the warm-up if it isn't done
+with st.spinner("Loading weather data..."):
+    weather_df = get_input(start_date, end_date)
 
 # Printing descriptive statistics about the river
 col1, col2, col3 , col4 = st.columns(4)
-today_features , features_evolution = get_feature_evolution(weather_df)
+today_features , features_evolution = require("chart_utils").get_feature_evolution(weather_df)
 today_precipitation , today_temperature , today_surface_pressure , today_wind = today_features
 precipitation_diff , temperature_diff , surface_pressure_diff , wind_diff = features_evolution
 
@@ -54,14 +73,13 @@ col4.metric("Wind", f"{today_wind:.2f} mph", "{:.2f}%".format(wind_diff))
 
 
 
-# Getting the model and making the prediction
-try:
-    predicted_df = safe_predict_with_model(weather_df, horizon=7)
-    
-except Exception as e:
-    st.warning(f"Failed to run model prediction: {e}")
+# Reading the forecast materialised by the pipeline
+stored_forecast = load_forecast()
+if is_stale(stored_forecast):
+    st.warning("No recent forecast available, showing a persistence forecast.")
     predicted_df = persistence_forecast(weather_df["rain_sum (mm)"], horizon=7)
-    
+else:
+    predicted_df = stored_forecast["forecast"]
 
 full_index = weather_df.index.union(predicted_df.index)
 weather_df = weather_df.reindex(full_index)
@@ -76,6 +94,16 @@ plot_predictions(weather_df)
 
 with st.expander("Diagnostics & Model Status", expanded=False):
     st.write("Data range:", start_date, "→", end_date)
+    if stored_forecast is not None:
+        st.write("Model run:", stored_forecast["run_id"], "· forecast generated at", stored_forecast["generated_at"])
+        # Precomputed when the forecast was materialised, keyed by the model run
+        explanation = load_explanation(stored_forecast["run_id"])
+        if explanation is not None:
+            day, contributions = top_contributions(explanation)
+            st.write(f"Main contributions to the forecast of {day:%d %b} (mm, from a base of "
+                     f"{explanation['base_values'][explanation['contributions'].index.get_loc(day)]:.2f}):")
+            st.bar_chart(contributions)
+    st.write("Start-up warm-up (s):", {name: round(seconds, 2) for name, seconds in timings().items()})
     st.write("Last 5 rows of data:")
     st.dataframe(weather_df[~weather_df["rain_sum (mm)"].isna()].tail(5))
 
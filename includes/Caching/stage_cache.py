@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.instrumentation import instrument_stage, record_cache_hit
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+STAGE_CACHE_DIR = Path(os.getenv("STAGE_CACHE_DIR", parent_dir / "data" / ".stage_cache"))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_digest(config):
+    """sha256 of a JSON-serialisable configuration."""
+    payload = json.dumps(config, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stage_key(inputs, config):
+    """Key of a stage run: the hash of every input file plus the config hash."""
+    digest = hashlib.sha256()
+    for path in inputs:
+        digest.update(str(Path(path).name).encode("utf-8"))
+        digest.update(file_digest(path).encode("utf-8"))
+    digest.update(config_digest(config).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _entry_path(stage, cache_dir):
+    return Path(cache_dir) / f"{stage}.json"
+
+
+def load_entry(stage, cache_dir=STAGE_CACHE_DIR):
+    path = _entry_path(stage, cache_dir)
+    if not path.is_file():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def store_entry(stage, key, output, cache_dir=STAGE_CACHE_DIR):
+    path = _entry_path(stage, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"key": key, "output": output}, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def run_cached(stage, func, inputs, config, ti=None, cache_dir=STAGE_CACHE_DIR, **kwargs):
+    """
+    Run a pipeline stage unless its inputs and config are unchanged.
+
+    The stage is skipped and its recorded output returned when the content
+    hash of `inputs` and `config` matches the last successful run. Whether
+    the cache was hit is logged and pushed to XCom as `stage_cache_hit`.
+    """
+    with instrument_stage(f"{stage}.cache"):
+        key = stage_key(inputs, config)
+        entry = load_entry(stage, cache_dir)
+        hit = entry is not None and entry["key"] == key
+        record_cache_hit(hits=int(hit), misses=int(not hit))
+
+        if hit:
+            logger.info(f"⏭ {stage}: inputs and config unchanged ({key[:12]}), skipping and reusing the cached output.")
+            output = entry["output"]
+        else:
+            logger.info(f"▶ {stage}: no cached run for {key[:12]}, running the stage.")
+            output = func(**kwargs)
+            store_entry(stage, key, output, cache_dir)
+
+    if ti is not None:
+        ti.xcom_push(key="stage_cache_hit", value=hit)
+        ti.xcom_push(key="stage_cache_key", value=key)
+    return output
@@ -1,18 +1,20 @@
 import logging
-from airflow.providers.slack.operators.slack import SlackAPIPostOperator
+from includes.Callbacks.notifier import enqueue_alert, error_signature
 
 def task_failure_alert(context):
-    ti = context.get('task_instance').id
-    dag_name = context.get('task_instance').dag_id
-    task_name = context.get('task_instance').task_id
-    execution_date = context.get('task_instance').start_date
-    log_url = context.get('task_instance').hostname
-    dag_run = context.get('task_instance_key_str')
+    """Spool a failure alert; the notifier sender delivers it, so the retry path never waits on Slack."""
+    task_instance = context.get('task_instance')
+    dag_name = task_instance.dag_id if task_instance else context.get('dag').dag_id
+    task_name = task_instance.task_id if task_instance else None
+    ti = task_instance.id if task_instance else None
+    execution_date = task_instance.start_date if task_instance else None
+    log_url = task_instance.hostname if task_instance else None
+    dag_run = context.get('task_instance_key_str') or context.get('run_id')
 
     logging.warning("Slack alert triggered!")
-    slack_alert = SlackAPIPostOperator(
-        task_id='notify_slack_failure',
-        slack_conn_id = 'slack_default',
+    return enqueue_alert(
+        dag_id=dag_name,
+        task_id=task_name,
         text=(
             ":red_circle: Task Failed.\n"
             f"*DAG*: {dag_name}\n"
@@ -22,7 +24,5 @@ def task_failure_alert(context):
             f"*Log URL*: {log_url}\n"
             f"*Dag Run*: {dag_run}\n"
         ),
-        channel="#issues",
-        username="airflow-bot" )
-    return  slack_alert.execute(context=context)
-
+        signature=error_signature(context.get('exception')),
+    )
@@ -0,0 +1,208 @@
+"""
+Failure notifier: a local spool, a coalescing sender and its transports.
+
+Failure callbacks only write an event file to the spool, which takes no
+network round trip. A background sender reads the spool, sends the first
+alert of each (dag, task, error signature) at once, folds the repeats of the
+next COALESCE_WINDOW seconds into a single summary, and delivers through a
+token bucket so a burst of failures can't flood Slack.
+
+    python includes/Callbacks/notifier.py            # run the sender
+    python includes/Callbacks/notifier.py --once     # drain the spool once
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+# Must be on a volume shared by the task runners and the sender
+SPOOL_DIR = Path(os.getenv("NOTIFIER_SPOOL_DIR", parent_dir / "data" / ".alert_spool"))
+COALESCE_WINDOW = float(os.getenv("NOTIFIER_COALESCE_WINDOW_SECONDS", "600"))
+POLL_INTERVAL = float(os.getenv("NOTIFIER_POLL_INTERVAL_SECONDS", "2"))
+RATE_PER_MINUTE = float(os.getenv("NOTIFIER_RATE_PER_MINUTE", "20"))
+BURST = int(os.getenv("NOTIFIER_BURST", "5"))
+TRANSPORT = os.getenv("NOTIFIER_TRANSPORT", "slack")
+SLACK_CONN_ID = os.getenv("NOTIFIER_SLACK_CONN_ID", "slack_default")
+SLACK_CHANNEL = os.getenv("NOTIFIER_SLACK_CHANNEL", "#issues")
+
+
+def error_signature(exception):
+    """Exception type and message with the numbers, hashes and paths that vary between retries removed."""
+    if exception is None:
+        return "unknown"
+    message = re.sub(r"0x[0-9a-fA-F]+|\d+|/[^\s'\"]+", "#", str(exception))[:200]
+    return hashlib.sha1(f"{type(exception).__name__}:{message}".encode("utf-8")).hexdigest()[:12]
+
+
+def enqueue_alert(dag_id, task_id, text, signature="unknown", spool_dir=SPOOL_DIR):
+    """Write an alert event to the spool. Local file I/O only, safe in a failing task's callback."""
+    spool_dir = Path(spool_dir)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    event = {"dag_id": dag_id, "task_id": task_id, "signature": signature, "text": text, "created_at": time.time()}
+    name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+    # Write then rename so the sender never reads a half-written event
+    tmp_path = spool_dir / f".{name}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(event, f)
+    os.replace(tmp_path, spool_dir / name)
+    return spool_dir / name
+
+
+# ---------------------
+# Transports
+# ---------------------
+class SlackTransport:
+    def __init__(self, conn_id=SLACK_CONN_ID, channel=SLACK_CHANNEL, username="airflow-bot"):
+        from airflow.providers.slack.hooks.slack import SlackHook
+        self.hook = SlackHook(slack_conn_id=conn_id)
+        self.channel = channel
+        self.username = username
+
+    def send(self, text):
+        self.hook.client.chat_postMessage(channel=self.channel, text=text, username=self.username)
+
+
+class StubTransport:
+    """Keeps the messages, and appends them to `path` when given. For tests and local runs."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.sent = []
+
+    def send(self, text):
+        self.sent.append(text)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"sent_at": time.time(), "text": text}) + "\n")
+
+
+def get_transport(name=TRANSPORT):
+    if name == "stub":
+        return StubTransport(os.getenv("NOTIFIER_STUB_PATH"))
+    return SlackTransport()
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute=RATE_PER_MINUTE, capacity=BURST):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# ---------------------
+# Sender
+# ---------------------
+class AlertSender:
+    """
+    Deliver the spooled alerts, coalesced per (dag, task, error signature).
+
+    Event files are only deleted once the message covering them is sent, so
+    a sender restart re-reads what was not delivered yet.
+    """
+
+    def __init__(self, transport, spool_dir=SPOOL_DIR, window=COALESCE_WINDOW, bucket=None):
+        self.transport = transport
+        self.spool_dir = Path(spool_dir)
+        self.window = window
+        self.bucket = bucket or TokenBucket()
+        # key -> {"event", "paths", "count", "first_at"} of the alerts not sent yet
+        self.pending = {}
+        # key -> time the last message for it was sent
+        self.last_sent = {}
+        self._seen = set()
+
+    def _ingest(self):
+        if not self.spool_dir.is_dir():
+            return
+        for path in sorted(self.spool_dir.glob("*.json")):
+            if path in self._seen:
+                continue
+            try:
+                with open(path) as f:
+                    event = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unreadable alert event {path.name} dropped: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            self._seen.add(path)
+            key = (event["dag_id"], event["task_id"], event["signature"])
+            group = self.pending.setdefault(key, {"event": event, "paths": [], "count": 0, "first_at": event["created_at"]})
+            group["paths"].append(path)
+            group["count"] += 1
+
+    def _due(self, key, now):
+        """The first alert of a key goes out at once, repeats wait for the end of the window."""
+        last = self.last_sent.get(key)
+        return last is None or now - last >= self.window
+
+    @staticmethod
+    def _message(group):
+        text = group["event"]["text"]
+        if group["count"] > 1:
+            text += f"\n_{group['count']} similar failures since {time.strftime('%H:%M:%S', time.localtime(group['first_at']))}_"
+        return text
+
+    def drain(self, now=None):
+        """Ingest the spool and send every due group the rate limit allows. Returns the number of messages sent."""
+        self._ingest()
+        now = now or time.time()
+        sent = 0
+        for key in sorted(self.pending, key=lambda key: self.pending[key]["first_at"]):
+            if not self._due(key, now):
+                continue
+            if not self.bucket.try_acquire():
+                break
+            group = self.pending[key]
+            try:
+                self.transport.send(self._message(group))
+            except Exception as e:
+                logger.warning(f"Alert for {key[0]}.{key[1]} not delivered, retrying later: {e}")
+                break
+            for path in group["paths"]:
+                path.unlink(missing_ok=True)
+                self._seen.discard(path)
+            del self.pending[key]
+            self.last_sent[key] = now
+            sent += 1
+        return sent
+
+    def run(self, poll_interval=POLL_INTERVAL, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        logger.info(f"📨 Alert sender watching {self.spool_dir} (window {self.window:.0f} s).")
+        while not stop_event.is_set():
+            self.drain()
+            stop_event.wait(poll_interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Deliver the spooled failure alerts.")
+    parser.add_argument("--once", action="store_true", help="Drain the spool once and exit.")
+    parser.add_argument("--transport", choices=["slack", "stub"], default=TRANSPORT)
+    args = parser.parse_args()
+
+    sender = AlertSender(get_transport(args.transport))
+    if args.once:
+        print(f"{sender.drain()} alerts sent.")
+        sys.exit(0)
+    sender.run()
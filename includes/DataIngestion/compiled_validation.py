@@ -0,0 +1,183 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from weather_suite import WEATHER_EXPECTATIONS, WEATHER_RULES, WEATHER_SUITE_NAME, LOCATION_COLUMN
+from rule_engine import evaluate_rules, partition_breakdown
+
+
+# Same sample size GE uses for partial_unexpected_list
+SAMPLE_SIZE = 20
+
+TABLE_EXPECTATIONS = {"expect_table_columns_to_match_set"}
+COLUMN_EXPECTATIONS = {
+    "expect_column_values_to_be_of_type",
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_not_be_null",
+    "expect_column_values_to_be_unique",
+}
+
+
+def compile_suite(expectations=WEATHER_EXPECTATIONS, rules=WEATHER_RULES):
+    """
+    Compile a serialised expectation suite into an evaluation plan.
+
+    The plan groups the column checks by column so that each column is
+    converted to a numpy array once and all of its checks run on it together.
+    Cross-column rules are kept aside for the rule engine.
+    """
+    table_checks = []
+    column_checks = defaultdict(list)
+    for position, expectation in enumerate(expectations):
+        if expectation["type"] in TABLE_EXPECTATIONS:
+            table_checks.append((position, expectation))
+        elif expectation["type"] in COLUMN_EXPECTATIONS:
+            column_checks[expectation["kwargs"]["column"]].append((position, expectation))
+        else:
+            raise ValueError(f"Expectation {expectation['type']} can't be compiled.")
+    return {"table": table_checks, "columns": dict(column_checks), "rules": list(rules),
+            "size": len(expectations)}
+
+
+def _map_result(series, unexpected, element_count, missing_count):
+    unexpected_index = np.flatnonzero(unexpected)
+    unexpected_count = int(unexpected_index.size)
+    sample = unexpected_index[:SAMPLE_SIZE]
+    return {
+        "element_count": element_count,
+        "missing_count": missing_count,
+        "missing_percent": 100 * missing_count / element_count if element_count else None,
+        "unexpected_count": unexpected_count,
+        "unexpected_percent": 100 * unexpected_count / element_count if element_count else None,
+        "partial_unexpected_list": series.iloc[sample].tolist() if sample.size else [],
+        "partial_unexpected_index_list": sample.tolist(),
+    }
+
+
+def _series_sample(series):
+    return lambda rows: series.iloc[rows].tolist()
+
+
+def _type_matches(series: pd.Series, type_):
+    if type_ in ("Timestamp", "datetime64", "datetime64[ns]"):
+        return pd.api.types.is_datetime64_any_dtype(series)
+    return series.dtype.name == type_
+
+
+def _check_table(expectation, frame: pd.DataFrame):
+    kwargs = expectation["kwargs"]
+    observed = frame.columns.tolist()
+    expected = set(kwargs["column_set"])
+    missing = sorted(expected - set(observed))
+    unexpected = sorted(set(observed) - expected)
+    success = not missing and not (kwargs.get("exact_match", True) and unexpected)
+    details = {"mismatched": {"missing": missing, "unexpected": unexpected}}
+    return success, {"observed_value": observed, "details": details}
+
+
+def _check_column(expectation, series: pd.Series, values, isnull, locations):
+    """(success, result, unexpected mask) of a column expectation, the mask is None when it maps no rows."""
+    kwargs = expectation["kwargs"]
+    element_count = len(values)
+    missing_count = int(isnull.sum())
+
+    if expectation["type"] == "expect_column_values_to_be_of_type":
+        success = _type_matches(series, kwargs["type_"])
+        return success, {"observed_value": series.dtype.name}, None
+
+    if expectation["type"] == "expect_column_values_to_not_be_null":
+        result = _map_result(series, isnull, element_count, missing_count)
+        result["partial_unexpected_list"] = []
+        return result["unexpected_count"] == 0, result, isnull
+
+    if expectation["type"] == "expect_column_values_to_be_between":
+        if values.dtype.kind not in "iufb":
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+            isnull = isnull | np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            inside = np.ones(element_count, dtype=bool)
+            if kwargs.get("min_value") is not None:
+                inside &= values >= kwargs["min_value"]
+            if kwargs.get("max_value") is not None:
+                inside &= values <= kwargs["max_value"]
+        unexpected = ~isnull & ~inside
+        result = _map_result(series, unexpected, element_count, missing_count)
+        return result["unexpected_count"] == 0, result, unexpected
+
+    if expectation["type"] == "expect_column_values_to_be_unique":
+        # Uniqueness is per location when the frame holds several of them
+        keys = pd.factorize(values)[0].astype(np.int64)
+        if locations is not None:
+            keys = keys * (int(locations.max()) + 1) + locations
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        unexpected = ~isnull & (counts[inverse] > 1)
+        result = _map_result(series, unexpected, element_count, missing_count)
+        return result["unexpected_count"] == 0, result, unexpected
+
+    raise ValueError(f"Expectation {expectation['type']} can't be evaluated.")
+
+
+def failed_result(expectation, message):
+    return {
+        "success": False,
+        "expectation_config": expectation,
+        "result": {},
+        "exception_info": {"raised_exception": True, "exception_message": message},
+    }
+
+
+def validate_dataframe(frame: pd.DataFrame, plan=None, suite_name=WEATHER_SUITE_NAME, groups=None):
+    """
+    Validate a frame against a compiled suite in one pass over its columns.
+
+    Returns a dict shaped like a GE validation result ("success", "results",
+    "statistics") so callers can read failing counts and samples the same way.
+    With `groups` (see `partition_breakdown`), the results of row-level
+    expectations also get their counts and samples per partition.
+    """
+    plan = plan or compile_suite()
+    if "date" not in frame.columns and frame.index.name == "date":
+        frame = frame.reset_index()
+
+    results = [None] * plan["size"]
+    for position, expectation in plan["table"]:
+        success, result = _check_table(expectation, frame)
+        results[position] = {"success": success, "expectation_config": expectation, "result": result}
+
+    locations = None
+    if LOCATION_COLUMN in frame.columns:
+        locations = pd.factorize(frame[LOCATION_COLUMN])[0].astype(np.int64)
+    for column, checks in plan["columns"].items():
+        if column not in frame.columns:
+            for position, expectation in checks:
+                results[position] = failed_result(expectation, f"Column {column} not found.")
+            continue
+
+        series = frame[column]
+        values = series.to_numpy()
+        isnull = pd.isna(values)
+        for position, expectation in checks:
+            success, result, unexpected = _check_column(expectation, series, values, isnull, locations)
+            results[position] = {"success": bool(success), "expectation_config": expectation, "result": result}
+            if groups is not None and unexpected is not None:
+                # Missing values have nothing to show, as in the unpartitioned result
+                sample = (lambda rows: []) if expectation["type"] == "expect_column_values_to_not_be_null" \
+                    else _series_sample(series)
+                results[position]["by_partition"] = partition_breakdown(groups, unexpected, isnull, sample)
+
+    if plan["rules"]:
+        results.extend(evaluate_rules(frame, plan["rules"], groups))
+
+    successful = sum(result["success"] for result in results)
+    return {
+        "success": successful == len(results),
+        "suite_name": suite_name,
+        "results": results,
+        "statistics": {
+            "evaluated_expectations": len(results),
+            "successful_expectations": successful,
+            "unsuccessful_expectations": len(results) - successful,
+            "success_percent": 100 * successful / len(results) if results else None,
+        },
+    }
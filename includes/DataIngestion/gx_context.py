@@ -0,0 +1,152 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+
+from compiled_validation import compile_suite
+from weather_suite import WEATHER_EXPECTATIONS, WEATHER_RULES, WEATHER_SUITE_NAME, suite_version
+
+logger = logging.getLogger(__name__)
+
+DATASOURCE_NAME = "weather_data_source"
+ASSET_NAME = "weather_dataframe_asset"
+BATCH_DEFINITION_NAME = "batch definition"
+COMPILED_SUITE_FILE = "compiled_suite.json"
+# Version of the suite stored in the GE project, apart from the compiled one:
+# each engine rebuilds its own copy when the definition changes
+GE_SUITE_VERSION_FILE = "ge_suite_version.json"
+
+
+def build_expectation(expectation):
+    """Turn a serialised expectation (type + kwargs) into its GE class."""
+    from great_expectations import expectations as gxe
+
+    class_name = "".join(part.capitalize() for part in expectation["type"].split("_"))
+    return getattr(gxe, class_name)(**expectation["kwargs"])
+
+
+def _compiled_suite_path(expectations_path):
+    return Path(expectations_path) / COMPILED_SUITE_FILE
+
+
+def save_compiled_suite(expectations_path, expectations=WEATHER_EXPECTATIONS, rules=WEATHER_RULES):
+    """Serialise the suite definition with its version next to the GE project."""
+    path = _compiled_suite_path(expectations_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "suite_name": WEATHER_SUITE_NAME,
+            "suite_version": suite_version(expectations, rules),
+            "expectations": expectations,
+            "rules": rules,
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def stored_suite_version(expectations_path):
+    path = _compiled_suite_path(expectations_path)
+    if not path.is_file():
+        return None
+    with open(path) as f:
+        return json.load(f).get("suite_version")
+
+
+def load_compiled_suite(expectations_path):
+    """
+    Load the compiled validation plan without starting Great Expectations.
+
+    The serialised suite is only rebuilt when the definition in
+    `weather_suite` no longer matches the stored version.
+    """
+    path = _compiled_suite_path(expectations_path)
+    current_version = suite_version()
+    if path.is_file():
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get("suite_version") == current_version:
+            return compile_suite(stored["expectations"], stored["rules"])
+        logger.info("Suite definition changed, recompiling the stored suite.")
+    save_compiled_suite(expectations_path)
+    return compile_suite()
+
+
+# File contexts opened by this process, keyed on their project root
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def get_context(expectations_path):
+    """File context of a GE project, opened once per process and reused by every later validation."""
+    root = str(Path(expectations_path).resolve())
+    context = _contexts.get(root)
+    if context is None:
+        with _contexts_lock:
+            context = _contexts.get(root)
+            if context is None:
+                import great_expectations as gx
+                context = _contexts[root] = gx.get_context(mode="file", project_root_dir=root)
+    return context
+
+
+def stored_ge_suite_version(expectations_path):
+    path = Path(expectations_path) / GE_SUITE_VERSION_FILE
+    if not path.is_file():
+        return None
+    with open(path) as f:
+        return json.load(f).get("suite_version")
+
+
+def _save_ge_suite_version(expectations_path, version):
+    path = Path(expectations_path) / GE_SUITE_VERSION_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"suite_name": WEATHER_SUITE_NAME, "suite_version": version}, f)
+    os.replace(tmp_path, path)
+
+
+def get_batch_definition(context):
+    """Get the weather batch definition, creating the datasource chain only once."""
+    try:
+        datasource = context.data_sources.get(DATASOURCE_NAME)
+    except (KeyError, ValueError, LookupError):
+        datasource = context.data_sources.add_pandas(name=DATASOURCE_NAME)
+
+    try:
+        data_asset = datasource.get_asset(ASSET_NAME)
+    except (KeyError, ValueError, LookupError):
+        data_asset = datasource.add_dataframe_asset(name=ASSET_NAME)
+
+    try:
+        return data_asset.get_batch_definition(BATCH_DEFINITION_NAME)
+    except (KeyError, ValueError, LookupError):
+        return data_asset.add_batch_definition_whole_dataframe(BATCH_DEFINITION_NAME)
+
+
+def get_suite(context, expectations_path):
+    """
+    Get the stored GE suite, rebuilding it only when its definition changed.
+    """
+    import great_expectations as gx
+
+    current_version = suite_version()
+    if stored_ge_suite_version(expectations_path) == current_version:
+        try:
+            return context.suites.get(name=WEATHER_SUITE_NAME)
+        except Exception:
+            logger.info("Suite version is current but the GE suite is missing, rebuilding it.")
+
+    try:
+        context.suites.delete(name=WEATHER_SUITE_NAME)
+    except Exception:
+        pass
+
+    expectation_suite = context.suites.add(gx.ExpectationSuite(WEATHER_SUITE_NAME))
+    for expectation in WEATHER_EXPECTATIONS:
+        expectation_suite.add_expectation(build_expectation(expectation))
+    expectation_suite.save()
+
+    _save_ge_suite_version(expectations_path, current_version)
+    logger.info(f"Built expectation suite {WEATHER_SUITE_NAME} version {current_version}.")
+    return expectation_suite
@@ -0,0 +1,141 @@
+import os
+import sys
+import logging
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.instrumentation import instrumented, set_rows
+from shared.locations import get_location, location_filename
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+DATA_PATH = parent_dir / 'data'
+HOURLY_PARTITIONS_PATH = DATA_PATH / "hourly_partitions"
+HOURLY_FEATURES_PREFIX = "hourly_features"
+
+# The order of variables is important to assign them correctly below
+HOURLY_VARIABLES = ["rain", "surface_pressure", "temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+# Days requested and reduced at once, bounds the hourly arrays held in memory
+CHUNK_DAYS = int(os.getenv("HOURLY_CHUNK_DAYS", "92"))
+# Also keep the raw hourly values, as zstd Parquet monthly partitions
+KEEP_RAW_HOURLY = os.getenv("KEEP_RAW_HOURLY", "0") == "1"
+
+
+def aggregate_hourly(hourly: dict, days: pd.DatetimeIndex):
+    """
+    Reduce hourly arrays to one row of engineered features per day.
+
+    Each array is reshaped to (days, 24) and reduced along the hours, so the
+    whole chunk is aggregated in a few numpy calls. Percentiles of a day
+    with missing hours are left empty rather than computed on fewer hours.
+    """
+    rain = hourly["rain"].reshape(-1, 24)
+    pressure = hourly["surface_pressure"].reshape(-1, 24)
+    temperature = hourly["temperature_2m"].reshape(-1, 24)
+    humidity = hourly["relative_humidity_2m"].reshape(-1, 24)
+    wind = hourly["wind_speed_10m"].reshape(-1, 24)
+
+    return pd.DataFrame({
+        "rain_rate_max (mm/h)": np.nanmax(rain, axis=1),
+        "rain_rate_p90 (mm/h)": np.percentile(rain, 90, axis=1),
+        "rain_hours_over_1mm": (rain >= 1.0).sum(axis=1),
+        "pressure_tendency (hPa)": pressure[:, -1] - pressure[:, 0],
+        "pressure_tendency_3h_max (hPa)": np.nanmax(np.abs(pressure[:, 3:] - pressure[:, :-3]), axis=1),
+        "temperature_2m_drop_1h_max (°C)": np.nanmax(temperature[:, :-1] - temperature[:, 1:], axis=1),
+        "temperature_2m_p90 (°C)": np.percentile(temperature, 90, axis=1),
+        "relative_humidity_2m_p10 (%)": np.percentile(humidity, 10, axis=1),
+        "wind_speed_10m_p90 (m/s)": np.percentile(wind, 90, axis=1),
+    }, index=days)
+
+
+def _decode_hourly(response):
+    """Hourly arrays of an Open-Meteo response trimmed to whole days, and the days they cover."""
+    hourly = response.Hourly()
+    start = pd.to_datetime(hourly.Time(), unit="s", utc=True)
+    values = {name: hourly.Variables(i).ValuesAsNumpy() for i, name in enumerate(HOURLY_VARIABLES)}
+
+    n_days = len(values["rain"]) // 24
+    values = {name: array[:n_days * 24].astype(np.float32) for name, array in values.items()}
+    days = pd.date_range(start=start, periods=n_days, freq="D", name="date")
+    return values, days
+
+
+def _date_chunks(start_date, end_date, chunk_days=CHUNK_DAYS):
+    start_date, end_date = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+    while start_date <= end_date:
+        chunk_end = min(start_date + timedelta(days=chunk_days - 1), end_date)
+        yield start_date, chunk_end
+        start_date = chunk_end + timedelta(days=1)
+
+
+def _store_raw(values, days, location):
+    from includes.DataVersioning.partitions import write_partitions
+
+    index = pd.date_range(start=days[0], periods=len(days) * 24, freq="h", name="date")
+    write_partitions(pd.DataFrame(values, index=index), location, partitions_path=HOURLY_PARTITIONS_PATH)
+
+
+def save_hourly_features(features: pd.DataFrame, location=None):
+    """Merge the new daily aggregates into the stored ones, re-fetched days replace the old rows."""
+    path = DATA_PATH / location_filename(location, "parquet", prefix=HOURLY_FEATURES_PREFIX)
+    if path.is_file():
+        stored = pd.read_parquet(path)
+        features = pd.concat([stored[~stored.index.isin(features.index)], features]).sort_index()
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    features.to_parquet(tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+@instrumented("HourlyFeatures")
+def get_hourly_features(start_date, end_date, location=None, save_data=True, keep_raw=KEEP_RAW_HOURLY, **kwargs):
+    """
+    Fetch hourly weather for a location and aggregate it into daily features.
+
+    The period is requested CHUNK_DAYS at a time and each chunk is reduced
+    to daily rows as soon as it is decoded, so at most one chunk of hourly
+    values is in memory. Only the daily aggregates are stored, plus the raw
+    hourly values as compressed partitions when `keep_raw` is set.
+    """
+    from includes.DataIngestion.scrape_data import get_client, url
+
+    coordinates = get_location(location)
+    chunks, hours = [], 0
+    for chunk_start, chunk_end in _date_chunks(start_date, end_date):
+        params = {
+            "latitude": coordinates["latitude"],
+            "longitude": coordinates["longitude"],
+            "start_date": chunk_start,
+            "end_date": chunk_end,
+            "hourly": HOURLY_VARIABLES,
+            "wind_speed_unit": "ms",
+            "temperature_unit": "celsius"
+        }
+        values, days = _decode_hourly(get_client().weather_api(url, params=params)[0])
+        chunks.append(aggregate_hourly(values, days))
+        hours += len(days) * 24
+        if keep_raw:
+            _store_raw(values, days, location)
+
+    features = pd.concat(chunks)
+    set_rows(rows_in=hours, rows_out=len(features))
+    if save_data:
+        path = save_hourly_features(features, location)
+        logger.info(f"⏱ {len(features)} days of hourly features from {hours} hours stored in {path.name}.")
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate hourly weather into daily features.")
+    parser.add_argument("--start_date", type=str, required=True, help="Start date in YYYY-MM-DD format.")
+    parser.add_argument("--end_date", type=str, default=str(date.today()), help="End date in YYYY-MM-DD format.")
+    parser.add_argument("--location", type=str, default=None)
+    parser.add_argument("--keep_raw", action="store_true", help="Also store the raw hourly values.")
+    args = parser.parse_args()
+    get_hourly_features(args.start_date, args.end_date, args.location, keep_raw=args.keep_raw)
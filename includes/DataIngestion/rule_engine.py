@@ -0,0 +1,134 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+from weather_suite import WEATHER_RULES
+
+SAMPLE_SIZE = 20
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def partition_breakdown(groups, unexpected, missing, sample):
+    """
+    Counts of a map expectation per partition, with the first unexpected rows of each.
+
+    `groups` is (codes, n_partitions, positions): the partition of every row
+    and its position within it. `sample(rows)` gives the reported values of
+    rows. Samples are {partition: [positions, values]}, only for partitions
+    with unexpected rows.
+    """
+    codes, n_partitions, positions = groups
+    breakdown = {
+        "element_count": np.bincount(codes, minlength=n_partitions).tolist(),
+        "missing_count": np.bincount(codes, weights=missing, minlength=n_partitions).astype(np.int64).tolist(),
+        "unexpected_count": np.bincount(codes, weights=unexpected, minlength=n_partitions).astype(np.int64).tolist(),
+        "samples": {},
+    }
+    rows = np.flatnonzero(unexpected)
+    if rows.size:
+        row_codes = codes[rows]
+        for code in np.unique(row_codes):
+            picked = rows[row_codes == code][:SAMPLE_SIZE]
+            breakdown["samples"][int(code)] = [positions[picked].tolist(), sample(picked)]
+    return breakdown
+
+
+def rule_columns(rule):
+    if rule["type"] == "implies":
+        return [rule["if"]["column"], rule["then"]["column"]]
+    if rule["type"] == "ordered":
+        return list(rule["columns"])
+    raise ValueError(f"Unknown rule type {rule['type']}.")
+
+
+def _condition(matrix, positions, condition):
+    return OPERATORS[condition["op"]](matrix[:, positions[condition["column"]]], condition["value"])
+
+
+def _violations(rule, matrix, positions):
+    """Boolean mask of the rows breaking a rule."""
+    if rule["type"] == "implies":
+        return _condition(matrix, positions, rule["if"]) & ~_condition(matrix, positions, rule["then"])
+
+    tolerance = rule.get("tolerance", 0.0)
+    columns = [matrix[:, positions[column]] for column in rule["columns"]]
+    broken = np.zeros(matrix.shape[0], dtype=bool)
+    for lower, upper in zip(columns, columns[1:]):
+        broken |= lower > upper + tolerance
+    return broken
+
+
+def _rule_config(rule):
+    return {"type": "expect_multicolumn_rule", "kwargs": {"rule": rule["name"], "columns": rule_columns(rule)}}
+
+
+def evaluate_rules(frame: pd.DataFrame, rules=WEATHER_RULES, groups=None):
+    """
+    Evaluate all cross-column rules in one vectorised pass.
+
+    Every column referenced by a rule is read once into a float matrix, each
+    rule becomes a boolean mask over it and the masks are stacked so the
+    violation counts come from a single reduction. Rows with a missing value
+    in one of the rule's columns are ignored, as in GE's column pair maps.
+    With `groups`, each result also gets its `partition_breakdown`.
+    """
+    available = [rule for rule in rules if all(col in frame.columns for col in rule_columns(rule))]
+    columns = sorted({col for rule in available for col in rule_columns(rule)})
+    positions = {col: idx for idx, col in enumerate(columns)}
+
+    matrix = frame[columns].to_numpy(dtype=np.float64)
+    missing = np.isnan(matrix)
+
+    masks = np.zeros((matrix.shape[0], len(available)), dtype=bool)
+    rule_missing = np.zeros((matrix.shape[0], len(available)), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for idx, rule in enumerate(available):
+            rule_missing[:, idx] = missing[:, [positions[col] for col in rule_columns(rule)]].any(axis=1)
+            masks[:, idx] = _violations(rule, matrix, positions) & ~rule_missing[:, idx]
+    missing_counts = rule_missing.sum(axis=0)
+    counts = masks.sum(axis=0)
+
+    element_count = matrix.shape[0]
+    results = {}
+    for idx, rule in enumerate(available):
+        sample = np.flatnonzero(masks[:, idx])[:SAMPLE_SIZE]
+
+        def records(rows, rule=rule):
+            return frame.iloc[rows][rule_columns(rule)].to_dict("records") if len(rows) else []
+
+        results[rule["name"]] = {
+            "success": bool(counts[idx] == 0),
+            "expectation_config": _rule_config(rule),
+            "result": {
+                "element_count": element_count,
+                "missing_count": int(missing_counts[idx]),
+                "unexpected_count": int(counts[idx]),
+                "unexpected_percent": 100 * int(counts[idx]) / element_count if element_count else None,
+                "partial_unexpected_list": records(sample),
+                "partial_unexpected_index_list": sample.tolist(),
+            },
+        }
+        if groups is not None:
+            results[rule["name"]]["by_partition"] = partition_breakdown(
+                groups, masks[:, idx], rule_missing[:, idx], records)
+
+    for rule in rules:
+        if rule["name"] not in results:
+            absent = [col for col in rule_columns(rule) if col not in frame.columns]
+            results[rule["name"]] = {
+                "success": False,
+                "expectation_config": _rule_config(rule),
+                "result": {},
+                "exception_info": {"raised_exception": True, "exception_message": f"Columns {absent} not found."},
+            }
+
+    return [results[rule["name"]] for rule in rules]
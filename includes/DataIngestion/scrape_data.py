@@ -1,12 +1,16 @@
 import os
-import openmeteo_requests
+import sys
 import argparse
+import threading
 
 import pandas as pd
-import requests_cache
-from retry_requests import retry
 from pathlib import Path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.dataset_handoff import write_dataset, push_dataset, file_digest
+from shared.locations import get_location, location_filename, resolve_location
+from shared.instrumentation import instrumented
+
 # Load environment variables from .env file
 parent_dir = Path(__file__).resolve().parents[2]  
 DATA_PATH = parent_dir / 'data'
@@ -17,88 +21,128 @@ Brazzaville_coordinates = {
     "longitude": 15.2832
 }
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-openmeteo = openmeteo_requests.Client(session = retry_session)
+# The Open-Meteo API client, with cache and retry on error, is created on first use
+# so importing this module doesn't open the requests_cache SQLite file
+_openmeteo = None
+_openmeteo_lock = threading.Lock()
+
+
+def get_client():
+    global _openmeteo
+    with _openmeteo_lock:
+        if _openmeteo is None:
+            import openmeteo_requests
+            import requests_cache
+            from retry_requests import retry
+
+            cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
+            retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
+            _openmeteo = openmeteo_requests.Client(session = retry_session)
+    return _openmeteo
 
 # Make sure all required weather variables are listed here
 # The order of variables in hourly or daily is important to assign them correctly below
 url = "https://archive-api.open-meteo.com/v1/archive"
 
 
-def get_weather_data(start_date , end_date ,save_data= False, **kwargs):
+def save_weather_data(daily_dataframe, location=None):
+    """Write the CSV and its typed Arrow copy for a location, returns the hand-off info."""
+    filename = location_filename(location)
+    # Write then rename so readers never see a half-written file
+    tmp_path = os.path.join(DATA_PATH, f".{filename}.tmp")
+    daily_dataframe.to_csv(tmp_path)
+    os.replace(tmp_path, os.path.join(DATA_PATH, filename))
+
+    # Typed Arrow copy that downstream tasks memory-map instead of parsing the CSV
+    csv_md5 = file_digest(os.path.join(DATA_PATH, filename), algorithm="md5")
+    dataset = write_dataset(daily_dataframe, DATA_PATH, filename=location_filename(location, "arrow"),
+                            source_md5=csv_md5)
+    return {**dataset, "csv_filename": filename, "location": location}
+
+
+def _decode_daily(response):
+    """Decode the daily block of an Open-Meteo response into a frame indexed by date."""
+    # Process daily data. The order of variables needs to be the same as requested.
+    daily = response.Daily()
+    daily_temperature_2m_max = daily.Variables(0).ValuesAsNumpy()
+    daily_temperature_2m_min = daily.Variables(1).ValuesAsNumpy()
+    daily_temperature_2m_mean = daily.Variables(2).ValuesAsNumpy()
+    daily_rain_sum = daily.Variables(3).ValuesAsNumpy()
+    daily_relative_humidity_2m_max = daily.Variables(4).ValuesAsNumpy()
+    daily_relative_humidity_2m_min = daily.Variables(5).ValuesAsNumpy()
+    daily_wind_speed_10m_max = daily.Variables(6).ValuesAsNumpy()
+    daily_wind_speed_10m_min = daily.Variables(7).ValuesAsNumpy()
+    daily_wind_speed_10m_mean = daily.Variables(8).ValuesAsNumpy()
+    daily_relative_humidity_2m_mean = daily.Variables(9).ValuesAsNumpy()
+    daily_cloudcover_mean = daily.Variables(10).ValuesAsNumpy()
+    daily_surface_pressure_mean = daily.Variables(11).ValuesAsNumpy()
+    daily_precipitation_hours = daily.Variables(12).ValuesAsNumpy()
+
+    # Create a DataFrame with the daily data
+    daily_data = {"date": pd.date_range(
+        start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = daily.Interval()),
+        inclusive = "left"
+    )}
+
+    daily_data["temperature_2m_max (°C)"] = daily_temperature_2m_max
+    daily_data["temperature_2m_min (°C)"] = daily_temperature_2m_min
+    daily_data["temperature_2m_mean (°C)"] = daily_temperature_2m_mean
+    daily_data["rain_sum (mm)"] = daily_rain_sum
+    daily_data["relative_humidity_2m_max (%)"] = daily_relative_humidity_2m_max
+    daily_data["relative_humidity_2m_min (%)"] = daily_relative_humidity_2m_min
+    daily_data["wind_speed_10m_max (m/s)"] = daily_wind_speed_10m_max
+    daily_data["wind_speed_10m_min (m/s)"] = daily_wind_speed_10m_min
+    daily_data["wind_speed_10m_mean (m/s)"] = daily_wind_speed_10m_mean
+    daily_data["relative_humidity_2m_mean (%)"] = daily_relative_humidity_2m_mean
+    daily_data["cloudcover_mean (%)"] = daily_cloudcover_mean
+    daily_data["surface_pressure_mean (hPa)"] = daily_surface_pressure_mean
+    daily_data["precipitation_hours"] = daily_precipitation_hours
+
+    # Create a DataFrame
+    daily_dataframe = pd.DataFrame(data = daily_data)
+    daily_dataframe.set_index("date", inplace = True)
+    # Open-Meteo sends float32, the suite and the stored datasets are float64
+    return daily_dataframe.astype("float64")
+
+
+@instrumented("DataFetching")
+def get_weather_data(start_date , end_date ,save_data= False, location=None, **kwargs):
     """
-    Helper function to get weather data for Brazzaville from Open-Meteo API."""
+    Helper function to get weather data for a location (Brazzaville by default) from Open-Meteo API.
+    `location` is a registered slug, name or alias, or a (latitude, longitude) pair fetched for the nearest location."""
 
+    location = resolve_location(location)
+    coordinates = Brazzaville_coordinates if location is None else get_location(location)
     params = {
-        "latitude": Brazzaville_coordinates["latitude"],
-        "longitude": Brazzaville_coordinates["longitude"],
+        "latitude": coordinates["latitude"],
+        "longitude": coordinates["longitude"],
         "start_date": start_date,
         "end_date": end_date,
         "daily": ["temperature_2m_max","temperature_2m_min","temperature_2m_mean","rain_sum",
                 "relative_humidity_2m_max","relative_humidity_2m_min",
                 "wind_speed_10m_max","wind_speed_10m_min","wind_speed_10m_mean",
-                "relative_humidity_2m_min","cloudcover_mean","surface_pressure_mean","precipitation_hours"],
+                "relative_humidity_2m_mean","cloudcover_mean","surface_pressure_mean","precipitation_hours"],
         "wind_speed_unit": "ms",
         "temperature_unit": "celsius"
     }
 
     try :
-        responses = openmeteo.weather_api(url, params=params)
+        responses = get_client().weather_api(url, params=params)
 
         # Process first and only location
         response = responses[0]
 
-        # Process daily data. The order of variables needs to be the same as requested.
-        daily = response.Daily()
-        daily_temperature_2m_max = daily.Variables(0).ValuesAsNumpy()
-        daily_temperature_2m_min = daily.Variables(1).ValuesAsNumpy()
-        daily_temperature_2m_mean = daily.Variables(2).ValuesAsNumpy()
-        daily_rain_sum = daily.Variables(3).ValuesAsNumpy()
-        daily_relative_humidity_2m_max = daily.Variables(4).ValuesAsNumpy()
-        daily_relative_humidity_2m_min = daily.Variables(5).ValuesAsNumpy()
-        daily_wind_speed_10m_max = daily.Variables(6).ValuesAsNumpy()
-        daily_wind_speed_10m_min = daily.Variables(7).ValuesAsNumpy()
-        daily_wind_speed_10m_mean = daily.Variables(8).ValuesAsNumpy()
-        daily_relative_humidity_2m_mean = daily.Variables(9).ValuesAsNumpy()
-        daily_cloudcover_mean = daily.Variables(10).ValuesAsNumpy()
-        daily_surface_pressure_mean = daily.Variables(11).ValuesAsNumpy()
-        daily_precipitation_hours = daily.Variables(12).ValuesAsNumpy()
-
-        # Create a DataFrame with the daily data
-        daily_data = {"date": pd.date_range(
-            start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = daily.Interval()),
-            inclusive = "left"
-        )}
-
-        daily_data["temperature_2m_max (°C)"] = daily_temperature_2m_max
-        daily_data["temperature_2m_min (°C)"] = daily_temperature_2m_min
-        daily_data["temperature_2m_mean (°C)"] = daily_temperature_2m_mean
-        daily_data["rain_sum (mm)"] = daily_rain_sum
-        daily_data["relative_humidity_2m_max (%)"] = daily_relative_humidity_2m_max
-        daily_data["relative_humidity_2m_min (%)"] = daily_relative_humidity_2m_min
-        daily_data["wind_speed_10m_max (m/s)"] = daily_wind_speed_10m_max
-        daily_data["wind_speed_10m_min (m/s)"] = daily_wind_speed_10m_min
-        daily_data["wind_speed_10m_mean (m/s)"] = daily_wind_speed_10m_mean
-        daily_data["relative_humidity_2m_mean (%)"] = daily_relative_humidity_2m_mean
-        daily_data["cloudcover_mean (%)"] = daily_cloudcover_mean
-        daily_data["surface_pressure_mean (hPa)"] = daily_surface_pressure_mean
-        daily_data["precipitation_hours"] = daily_precipitation_hours
-
-        # Create a DataFrame and save it to CSV
-        daily_dataframe = pd.DataFrame(data = daily_data)
-        daily_dataframe.set_index("date", inplace = True)
+        daily_dataframe = _decode_daily(response)
 
         if save_data:
-            filename = "weather_data.csv"
-            daily_dataframe.to_csv(os.path.join(DATA_PATH, filename))
+            dataset = save_weather_data(daily_dataframe, location)
 
-        if 'ti' in kwargs:
-            ti = kwargs['ti']
-            ti.xcom_push(key='weather_filename', value=filename)
+            if 'ti' in kwargs:
+                ti = kwargs['ti']
+                ti.xcom_push(key='weather_filename', value=dataset["csv_filename"])
+                push_dataset(ti, dataset)
             
         return daily_dataframe
 
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compiled_validation import compile_suite, validate_dataframe, failed_result, SAMPLE_SIZE
+from weather_suite import WEATHER_EXPECTATIONS, WEATHER_RULES, WEATHER_SUITE_NAME, LOCATION_COLUMN, suite_version
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+VALIDATION_CACHE_DIR = Path(os.getenv("VALIDATION_CACHE_DIR", parent_dir / "data" / ".validation_cache"))
+MANIFEST_FILENAME = "manifest.json"
+
+
+def partition_codes(dates: pd.Series, locations=None):
+    """
+    Monthly partition of each row, prefixed by the location when there are several.
+
+    Returns one integer code per row and the label of each code, computed
+    from the year and month numbers without formatting every date.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    months = (dates.dt.year * 12 + dates.dt.month - 1).fillna(-1).to_numpy(dtype=np.int64)
+    location_codes, location_labels = (np.zeros(len(months), dtype=np.int64), np.array([None], dtype=object)) \
+        if locations is None else pd.factorize(locations)
+    # One integer per (location, month), undated rows first within a location
+    span = int(months.max()) + 2
+    uniques, codes = np.unique(location_codes.astype(np.int64) * span + months + 1, return_inverse=True)
+
+    labels = []
+    for location_code, month in zip(uniques // span, uniques % span - 1):
+        label = "undated" if month < 0 else f"{month // 12:04d}-{month % 12 + 1:02d}"
+        if locations is not None:
+            label = f"{location_labels[location_code]}/{label}"
+        labels.append(label)
+    return codes, labels
+
+
+def schema_hash(frame: pd.DataFrame):
+    """Hash of the column names and dtypes, a change invalidates every partition."""
+    payload = json.dumps([[col, str(dtype)] for col, dtype in frame.dtypes.items()])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _partition_slices(codes, n_partitions):
+    """Row order grouping the partitions, and the bounds of each partition in it."""
+    order = np.argsort(codes, kind="stable")
+    return order, np.searchsorted(codes[order], np.arange(n_partitions + 1))
+
+
+def partition_hashes(frame: pd.DataFrame, order, bounds):
+    """Content hash of every partition, from one vectorised hash of all the rows."""
+    sorted_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()[order]
+    return [hashlib.sha256(sorted_hashes[start:end].tobytes()).hexdigest()
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _split_results(results, labels):
+    """
+    Templates of a grouped validation's results, and the counts and samples of each partition.
+
+    Row-level results become templates whose counts are filled in by
+    `merge_results`. Table and type results depend on the schema only, they
+    are kept whole.
+    """
+    templates, partitions = [], {label: {"counts": [], "samples": {}} for label in labels}
+    for position, result in enumerate(results):
+        breakdown = result.pop("by_partition", None)
+        templates.append({**result, "map": breakdown is not None})
+        for code, label in enumerate(labels):
+            if breakdown is None:
+                partitions[label]["counts"].append([0, 0, 0])
+                continue
+            partitions[label]["counts"].append([breakdown["element_count"][code], breakdown["missing_count"][code],
+                                                breakdown["unexpected_count"][code]])
+            if code in breakdown["samples"]:
+                partitions[label]["samples"][str(position)] = breakdown["samples"][code]
+    return templates, partitions
+
+
+def merge_results(templates, partitions):
+    """Results of the whole dataset from the counts and samples of each of its partitions."""
+    totals = np.array([entry["counts"] for entry in partitions], dtype=np.int64).sum(axis=0)
+    results = []
+    for position, template in enumerate(templates):
+        if not template["map"]:
+            results.append({key: value for key, value in template.items() if key != "map"})
+            continue
+
+        element_count, missing_count, unexpected_count = (int(total) for total in totals[position])
+        result = dict(template["result"], element_count=element_count, missing_count=missing_count,
+                      unexpected_count=unexpected_count)
+        if "missing_percent" in result:
+            result["missing_percent"] = 100 * missing_count / element_count if element_count else None
+        result["unexpected_percent"] = 100 * unexpected_count / element_count if element_count else None
+
+        # Samples of the partitions in order, positions counted over the partitions put end to end
+        samples, indexes, offset = [], [], 0
+        for entry in partitions if unexpected_count else ():
+            if len(indexes) >= SAMPLE_SIZE:
+                break
+            if str(position) in entry["samples"]:
+                partition_indexes, partition_samples = entry["samples"][str(position)]
+                indexes.extend(offset + index for index in partition_indexes)
+                samples.extend(partition_samples)
+            offset += entry["counts"][position][0]
+        result["partial_unexpected_list"] = samples[:SAMPLE_SIZE]
+        result["partial_unexpected_index_list"] = indexes[:SAMPLE_SIZE]
+        results.append({"success": unexpected_count == 0, "expectation_config": template["expectation_config"],
+                        "result": result})
+    return results
+
+
+def _load_manifest(cache_dir: Path, version: str, schema: str):
+    path = cache_dir / MANIFEST_FILENAME
+    if not path.is_file():
+        return {}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("suite_version") != version or manifest.get("schema_hash") != schema:
+        return {}
+    return manifest
+
+
+def _store_manifest(cache_dir: Path, manifest):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / MANIFEST_FILENAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        # json.dumps encodes in C, json.dump streams through the pure Python encoder
+        f.write(json.dumps(manifest, default=str))
+    os.replace(tmp_path, path)
+
+
+def _summary(results, partitions, validated, cached):
+    successful = sum(result["success"] for result in results)
+    return {
+        "success": bool(results) and successful == len(results),
+        "suite_name": WEATHER_SUITE_NAME,
+        "results": results,
+        "statistics": {
+            "evaluated_expectations": len(results),
+            "successful_expectations": successful,
+            "unsuccessful_expectations": len(results) - successful,
+            "success_percent": 100 * successful / len(results) if results else None,
+            "partitions": partitions,
+            "validated_partitions": validated,
+            "cached_partitions": cached,
+        },
+    }
+
+
+def validate_incremental(df: pd.DataFrame, expectations=WEATHER_EXPECTATIONS, rules=WEATHER_RULES,
+                         cache_dir=VALIDATION_CACHE_DIR):
+    """
+    Validate only the monthly partitions that are new or changed since the last run.
+
+    One manifest keeps, for a suite version and schema, the content hash of
+    every partition next to its counts and samples per expectation. The
+    changed partitions are validated together in one grouped call, then the
+    counts of all partitions are added up, so the results describe the whole
+    dataset. Dates can't repeat across months, so uniqueness over the changed
+    partitions is global uniqueness.
+    """
+    cache_dir = Path(cache_dir)
+    version = suite_version(expectations, rules)
+    plan = compile_suite(expectations, rules)
+
+    if "date" not in df.columns and df.index.name == "date":
+        df = df.reset_index()
+    if df.empty:
+        results = [failed_result({"type": "expect_table_row_count_to_be_between", "kwargs": {"min_value": 1}},
+                                  "The frame has no rows.")]
+        return _summary(results, 0, 0, 0)
+    if "date" not in df.columns:
+        # Partitions are monthly, without dates the whole frame is validated and reported failing
+        results = validate_dataframe(df, plan)["results"]
+        results.append(failed_result({"type": "expect_column_to_exist", "kwargs": {"column": "date"}},
+                                      "Column date not found."))
+        return _summary(results, 0, 0, 0)
+
+    locations = df[LOCATION_COLUMN] if LOCATION_COLUMN in df.columns else None
+    codes, labels = partition_codes(df["date"], locations)
+    order, bounds = _partition_slices(codes, len(labels))
+    digests = partition_hashes(df, order, bounds)
+    schema = schema_hash(df)
+    manifest = _load_manifest(cache_dir, version, schema)
+    stored = manifest.get("partitions", {})
+
+    changed = [code for code, (label, digest) in enumerate(zip(labels, digests))
+               if stored.get(label, {}).get("hash") != digest]
+    templates = manifest.get("results")
+    if changed:
+        sizes = np.diff(bounds)[changed]
+        rows = np.concatenate([order[bounds[code]:bounds[code + 1]] for code in changed])
+        groups = (np.repeat(np.arange(len(changed)), sizes), len(changed),
+                  np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+        results = validate_dataframe(df.iloc[rows].reset_index(drop=True), plan, groups=groups)["results"]
+        templates, fresh = _split_results(results, [labels[code] for code in changed])
+        for code in changed:
+            fresh[labels[code]]["hash"] = digests[code]
+        stored = {**stored, **fresh}
+
+    partitions = {label: stored[label] for label in labels}
+    if changed or len(partitions) != len(stored):
+        # Failing partitions are kept too, the same rows fail the same way
+        _store_manifest(cache_dir, {"suite_version": version, "schema_hash": schema,
+                                    "results": templates, "partitions": partitions})
+    results = merge_results(templates, [partitions[label] for label in labels])
+
+    validated = len(changed)
+    cached = len(labels) - validated
+    logger.info(f"Validated {validated} new or changed partitions, {cached} served from cache (suite {version}).")
+    return _summary(results, len(labels), validated, cached)
@@ -0,0 +1,120 @@
+"""
+Declarative definition of the weather expectation suite and its cross-column rules.
+
+The suite is kept in Great Expectations' serialised form so it can be turned
+into GE expectations by `ge_setup` or compiled into vectorised checks by
+`compiled_validation` without importing great_expectations.
+"""
+import json
+import hashlib
+
+WEATHER_SUITE_NAME = "weather_data_expectations"
+
+# Column holding the location name in multi-location datasets
+LOCATION_COLUMN = "location"
+
+WEATHER_EXPECTATIONS = [
+    # Table related expectation
+    # Les colonnes doivent etre dans un set précis
+    {"type": "expect_table_columns_to_match_set",
+     "kwargs": {"column_set": ["date",
+                               "temperature_2m_max (°C)",
+                               "temperature_2m_min (°C)",
+                               "rain_sum (mm)",
+                               "relative_humidity_2m_max (%)",
+                               "relative_humidity_2m_min (%)",
+                               "wind_speed_10m_max (m/s)",
+                               "wind_speed_10m_min (m/s)",
+                               "wind_speed_10m_mean (m/s)",
+                               "relative_humidity_2m_mean (%)",
+                               "cloudcover_mean (%)",
+                               "surface_pressure_mean (hPa)",
+                               "precipitation_hours"],
+                "exact_match": False}},
+
+    # Validation des types
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "date", "type_": "Timestamp"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "rain_sum (mm)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "temperature_2m_max (°C)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "temperature_2m_min (°C)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "relative_humidity_2m_max (%)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "relative_humidity_2m_min (%)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "wind_speed_10m_max (m/s)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "wind_speed_10m_min (m/s)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "cloudcover_mean (%)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "surface_pressure_mean (hPa)", "type_": "float64"}},
+    {"type": "expect_column_values_to_be_of_type", "kwargs": {"column": "precipitation_hours", "type_": "float64"}},
+
+    # Expectation 1 : la température maximale doit être supérieure à -5°C et inférieur à 50°C
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "temperature_2m_max (°C)", "min_value": -5, "max_value": 50}},
+
+    # Expectation 2 : La température minimale doit être supérieure à -5°C et inférieur à 50°C
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "temperature_2m_min (°C)", "min_value": -5, "max_value": 50}},
+
+    # Expectation 3 : L'humidité maximale doit être comprise entre 0% et 100%
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "relative_humidity_2m_max (%)", "min_value": 0, "max_value": 100}},
+
+    # Expectation 4 : L'humidité minimale doit être comprise entre 0% et 100%
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "relative_humidity_2m_min (%)", "min_value": 0, "max_value": 100}},
+
+    # Expectation 5 : La vitesse du vent maximale doit être supérieure à 0 et inférieure à 30 m/s
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "wind_speed_10m_max (m/s)", "min_value": 0, "max_value": 30}},
+
+    # Expectation 6 : La vitesse du vent minimale doit être supérieure à 0 et inférieure à 30 m/s
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "wind_speed_10m_min (m/s)", "min_value": 0, "max_value": 30}},
+
+    # Expectation 7 : L'humidité moyenne doit être comprise entre 0% et 100%
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "relative_humidity_2m_mean (%)", "min_value": 0, "max_value": 100}},
+
+    # Expectation 8 : la couverture nuageuse moyenne doit être comprise entre 0% et 100%
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "cloudcover_mean (%)", "min_value": 0, "max_value": 100}},
+
+    # Expectation 9 : la pression atmosphérique moyenne doit être comprise entre 980 hPa et 1050 hPa
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "surface_pressure_mean (hPa)", "min_value": 970, "max_value": 1050}},
+
+    # Expectation 10 : Le nombre d'heures de précipitation doit être supérieur à 0 et inférieur à 24h
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "precipitation_hours", "min_value": 0, "max_value": 24}},
+
+    # Expectation 11 : Le somme des pluies doit être supérieur ou égal à 0 et inférieur à 150 mm
+    {"type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "rain_sum (mm)", "min_value": 0, "max_value": 150}},
+
+    # Expectation 13: les dates doivent etre distinctes , uniques , non nulles
+    {"type": "expect_column_values_to_not_be_null", "kwargs": {"column": "date"}},
+    {"type": "expect_column_values_to_be_unique", "kwargs": {"column": "date"}},
+]
+
+
+# Cross-column physical rules, evaluated together by `rule_engine`.
+# "implies": rows matching the "if" condition must match the "then" condition.
+# "ordered": the columns must be non-decreasing from left to right.
+WEATHER_RULES = [
+    # Expectation 14: Si precipitation_hours == 0, alors rain_sum == 0
+    {"name": "rain_implies_precipitation_hours", "type": "implies",
+     "if": {"column": "precipitation_hours", "op": "==", "value": 0},
+     "then": {"column": "rain_sum (mm)", "op": "==", "value": 0}},
+
+    # La température, l'humidité et le vent moyens sont compris entre le minimum et le maximum
+    {"name": "temperature_min_mean_max", "type": "ordered",
+     "columns": ["temperature_2m_min (°C)", "temperature_2m_mean (°C)", "temperature_2m_max (°C)"]},
+    {"name": "humidity_min_mean_max", "type": "ordered",
+     "columns": ["relative_humidity_2m_min (%)", "relative_humidity_2m_mean (%)", "relative_humidity_2m_max (%)"]},
+    {"name": "wind_speed_min_mean_max", "type": "ordered",
+     "columns": ["wind_speed_10m_min (m/s)", "wind_speed_10m_mean (m/s)", "wind_speed_10m_max (m/s)"]},
+]
+
+
+def suite_version(expectations=WEATHER_EXPECTATIONS, rules=WEATHER_RULES):
+    """Content hash of the suite definition, changes whenever an expectation or rule does."""
+    payload = json.dumps([expectations, rules], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
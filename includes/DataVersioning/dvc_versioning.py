@@ -0,0 +1,12 @@
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def version_data(*data_files):
+    """Track data files with DVC, in a single `dvc add` call."""
+    data_files = [str(data_file) for data_file in data_files]
+    subprocess.run(["dvc", "add", *data_files], check=True)
+    logger.info(f"📦 {len(data_files)} files versioned with DVC.")
+    return data_files
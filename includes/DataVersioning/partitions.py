@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from includes.DataVersioning.dvc_versioning import version_data
+from shared.dataset_handoff import file_digest
+from shared.locations import location_key
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+PARTITIONS_PATH = parent_dir / "data" / "partitions"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def partition_dir(location=None, partitions_path=PARTITIONS_PATH):
+    return Path(partitions_path) / location_key(location)
+
+
+def frame_hash(frame: pd.DataFrame):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[col, str(dtype)] for col, dtype in frame.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(directory: Path):
+    path = Path(directory) / MANIFEST_FILENAME
+    if not path.is_file():
+        return {"partitions": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_partitions(df: pd.DataFrame, location=None, partitions_path=PARTITIONS_PATH):
+    """
+    Split a daily frame into monthly Parquet partitions and write the changed ones.
+
+    A partition is only rewritten when its content hash differs from the one
+    in the manifest, so closed months are written once and only the new or
+    revised months are touched. Returns the written files and the manifest path.
+    """
+    directory = partition_dir(location, partitions_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(directory)
+
+    index = df.index.tz_convert("UTC") if df.index.tz is not None else df.index
+    months = index.strftime("%Y-%m")
+
+    written = []
+    for month, partition in df.groupby(months, sort=True):
+        content_hash = frame_hash(partition)
+        entry = manifest["partitions"].get(month)
+        if entry is not None and entry["content_hash"] == content_hash:
+            continue
+
+        # Keep the history already stored for days the new download doesn't cover
+        filename = f"{month}.parquet"
+        path = directory / filename
+        if entry is not None and path.is_file():
+            stored = pd.read_parquet(path)
+            partition = pd.concat([stored[~stored.index.isin(partition.index)], partition]).sort_index()
+            content_hash = frame_hash(partition)
+            if content_hash == entry["content_hash"]:
+                continue
+
+        tmp_path = directory / f".{filename}.tmp"
+        partition.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+        manifest["partitions"][month] = {
+            "file": filename,
+            "content_hash": content_hash,
+            "md5": file_digest(path, algorithm="md5"),
+            "rows": len(partition),
+            "first_date": str(partition.index.min()),
+            "last_date": str(partition.index.max()),
+        }
+        written.append(path)
+
+    manifest_path = directory / MANIFEST_FILENAME
+    if written or not manifest_path.is_file():
+        manifest["partitions"] = dict(sorted(manifest["partitions"].items()))
+        tmp_path = directory / f".{MANIFEST_FILENAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    logger.info(f"{len(written)} partitions written out of {len(manifest['partitions'])} for {location_key(location)}.")
+    return written, manifest_path
+
+
+def version_partitions(df: pd.DataFrame, location=None, partitions_path=PARTITIONS_PATH):
+    """
+    Version a dataset as immutable monthly partitions.
+
+    Only the new or changed partitions and the small manifest go through
+    `dvc add`, so hashing and cache storage grow with the new data rather
+    than with the whole history.
+    """
+    written, manifest_path = write_partitions(df, location, partitions_path)
+    if written:
+        version_data(*written, manifest_path)
+    return {
+        "location": location,
+        "written_partitions": [path.name for path in written],
+        "manifest": str(manifest_path),
+    }
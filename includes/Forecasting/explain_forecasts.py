@@ -0,0 +1,100 @@
+"""
+Feature contributions of the materialised forecasts.
+
+The lag features of every location's forecast are put in one matrix and
+explained with a single TreeSHAP call on the CatBoost booster, giving for
+each forecast day the contribution of every (lag, covariate) feature. The
+results are stored next to the forecasts, keyed by the model's run id, so
+the frontend reads them instead of running SHAP on request.
+
+An explanation is only stored when its base value plus contributions
+reproduce the stored forecast, so a forecast predicted from other features
+(e.g. the darts path on a snapshot the buffer has not caught up with) is
+never shown with a wrong explanation.
+"""
+import os
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.forecast_store import save_explanations, has_explanation
+from shared.instrumentation import instrumented, set_rows
+from shared.observation_buffer import native_regressor
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_FORECASTS = os.getenv("EXPLAIN_FORECASTS", "1") == "1"
+# Largest gap between the forecast and base value + contributions, in mm
+EXPLANATION_TOLERANCE = float(os.getenv("EXPLANATION_TOLERANCE", "0.01"))
+
+
+def shap_values(model, features: np.ndarray):
+    """
+    (base values, contributions) of every row and forecast day, shaped (rows, days) and (rows, days, features).
+
+    A multi-output booster is explained in one call. When darts fitted one
+    booster per forecast day, each is called once on all the rows.
+    """
+    from catboost import Pool
+
+    regressor = native_regressor(model)
+    pool = Pool(features)
+    if hasattr(regressor, "estimators_"):
+        values = np.stack([estimator.get_feature_importance(data=pool, type="ShapValues")
+                           for estimator in regressor.estimators_], axis=1)
+    else:
+        values = regressor.get_feature_importance(data=pool, type="ShapValues")
+        if values.ndim == 2:
+            values = values[:, np.newaxis, :]
+    # The last column is the expected value of the model
+    return values[:, :, -1], values[:, :, :-1]
+
+
+def matches_forecast(origin, base_values, contributions, forecast: pd.Series, tolerance=EXPLANATION_TOLERANCE):
+    """Whether an explanation from `origin` adds up to the stored `forecast`, day by day."""
+    if forecast.index[0].tz_localize(None).normalize() != origin + pd.Timedelta(days=1):
+        return False
+    explained = (base_values + contributions.sum(axis=-1))[:len(forecast)]
+    return len(explained) == len(forecast) and np.allclose(explained, forecast.to_numpy(), rtol=0, atol=tolerance)
+
+
+@instrumented("ForecastExplanation")
+def explain_forecasts(store, run_id, model, locations, forecasts):
+    """
+    Explain the next forecast of `locations`, all served by the model of `run_id`, and store it.
+
+    `forecasts` are the {location: forecast} just stored, a location whose
+    explanation does not add up to its forecast is skipped.
+    """
+    origins = {location: store.last_day(location) for location in locations}
+    # Already explained for this run and origin, e.g. a materialisation retry
+    locations = [location for location in locations if not has_explanation(run_id, location, origins[location])]
+    if not locations:
+        return {}
+
+    base_values, contributions = shap_values(model, store.feature_matrix(locations))
+    set_rows(rows_in=len(locations), rows_out=contributions.shape[0] * contributions.shape[1])
+
+    features = store.feature_names()
+    explanations = {}
+    for i, location in enumerate(locations):
+        if not matches_forecast(origins[location], base_values[i], contributions[i], forecasts[location]):
+            logger.warning(f"⚠️ Explanation of {location or 'the default location'} does not match its stored "
+                           f"forecast (run {run_id}), not stored.")
+            continue
+        dates = pd.date_range(origins[location] + pd.Timedelta(days=1), periods=contributions.shape[1], freq="D")
+        explanations[location] = {
+            "origin": str(origins[location].date()),
+            "dates": [str(date.date()) for date in dates],
+            "features": features,
+            "base_values": base_values[i].tolist(),
+            "contributions": contributions[i].round(6).tolist(),
+        }
+    if explanations:
+        save_explanations(run_id, explanations)
+    logger.info(f"🔎 Forecasts of {len(explanations)} locations explained (run {run_id}).")
+    return explanations
+
@@ -0,0 +1,119 @@
+import os
+import sys
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.data_snapshot import load_snapshot
+from shared.forecast_store import save_forecast
+from includes.Forecasting.explain_forecasts import explain_forecasts, EXPLAIN_FORECASTS
+from shared.instrumentation import instrumented
+from shared.locations import location_filename, location_key
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+DATA_PATH = parent_dir / "data"
+FORECAST_HORIZON = 7
+# Predict from the per-location observation buffers instead of darts TimeSeries
+USE_OBSERVATION_BUFFER = os.getenv("USE_OBSERVATION_BUFFER", "0") == "1"
+
+
+def forecast_location(location=None, horizon=FORECAST_HORIZON, data_path=DATA_PATH):
+    """7-day forecast from the end of the latest snapshot of a location, with the model's run id."""
+    from darts import TimeSeries
+    from shared.data_utils import prepare_features
+    from shared.model_utils import latest_model
+    from shared.variables import past_covariate_cols, target_col
+
+    data, _ = load_snapshot(data_path, location_filename(location), location=location)
+    data.index = data.index.tz_localize(None)
+    data = prepare_features(data)
+
+    target_series = TimeSeries.from_dataframe(data, value_cols=[target_col])
+    past_covariates = TimeSeries.from_dataframe(data, value_cols=past_covariate_cols)
+
+    run_id, model = latest_model(location)
+    forecast = model.predict(horizon, series=target_series, past_covariates=past_covariates)
+    forecast = forecast.to_dataframe().iloc[:, 0].rename("predicted_rain (mm)")
+    # Same UTC dates as the data fetched by the frontend
+    forecast.index = forecast.index.tz_localize("UTC")
+    return run_id, forecast
+
+
+def buffer_locations(locations, data_path=DATA_PATH):
+    """
+    Observation buffers of `locations`, as persisted by the versioning task.
+
+    A location without a buffer yet is bootstrapped from its snapshot once.
+    Returns the store and {run_id: (model, locations)} of the models serving them.
+    """
+    from shared.model_utils import latest_model
+    from shared.observation_buffer import get_observation_store
+
+    store = get_observation_store()
+    by_run = {}
+    for location in locations:
+        if store.last_day(location) is None:
+            data, _ = load_snapshot(data_path, location_filename(location), location=location)
+            logger.info(f"No observation buffer for {location or 'the default location'}, built from the snapshot.")
+            store.update(location, data, data.index.min())
+        run_id, model = latest_model(location)
+        by_run.setdefault(run_id, (model, []))[1].append(location)
+    return store, by_run
+
+
+def buffered_forecasts(store, by_run, horizon=FORECAST_HORIZON):
+    """
+    {location: (run_id, forecast)} predicted from the observation buffers.
+
+    The locations served by the same model are predicted in one call.
+    """
+    from shared.observation_buffer import predict_from_store
+
+    forecasts = {}
+    for run_id, (model, run_locations) in by_run.items():
+        predictions = predict_from_store(store, run_locations, model)
+        if predictions.shape[1] < horizon:
+            raise ValueError(f"The model predicts {predictions.shape[1]} days at once, {horizon} requested.")
+        for location, values in zip(run_locations, predictions):
+            # Same UTC dates as the data fetched by the frontend
+            dates = pd.date_range(store.last_day(location) + pd.Timedelta(days=1), periods=horizon, freq="D", tz="UTC")
+            forecasts[location] = (run_id, pd.Series(values[:horizon], index=dates, name="predicted_rain (mm)"))
+    return forecasts
+
+
+@instrumented("ForecastMaterialisation")
+def materialise_forecasts(locations=(None,), horizon=FORECAST_HORIZON, use_buffer=USE_OBSERVATION_BUFFER,
+                          explain=EXPLAIN_FORECASTS, **kwargs):
+    """
+    Precompute the forecast of every location into the forecast store.
+
+    Runs after training, so the frontend only reads one row per location
+    instead of loading the model and predicting on each page load.
+    """
+    # The persisted buffers serve the explanations too, no snapshot is reloaded for them
+    store, by_run = buffer_locations(locations) if use_buffer or explain else (None, None)
+    if use_buffer:
+        forecasts = buffered_forecasts(store, by_run, horizon)
+    else:
+        forecasts = {location: forecast_location(location, horizon) for location in locations}
+
+    materialised = {}
+    for location in locations:
+        run_id, forecast = forecasts[location]
+        save_forecast(location, forecast, run_id)
+        materialised[location_key(location)] = run_id
+        logger.info(f"🗓 {horizon}-day forecast of {location or 'the default location'} stored (run {run_id}).")
+
+    if explain:
+        for run_id, (model, run_locations) in by_run.items():
+            try:
+                explain_forecasts(store, run_id, model, run_locations,
+                                  {location: forecasts[location][1] for location in run_locations})
+            except Exception as e:
+                # The forecasts are stored, a missing explanation only hides the diagnostics
+                logger.warning(f"⚠️ Forecasts of run {run_id} not explained: {e}")
+    return materialised
@@ -10,6 +10,9 @@ from evidently.future.tests import Reference
 
 from evidently.ui.workspace import RemoteWorkspace,ProjectModel
 from monitoring_utils import prepare_data
+from parallel_drift import parallel_drift_report
+from shared.locations import cut_off_key
+from shared.instrumentation import instrumented, set_rows
 
 from dotenv import set_key ,load_dotenv
 load_dotenv()
@@ -18,6 +21,9 @@ EVIDENTLY_SERVER_URL = os.getenv('EVIDENTLY_SERVER_URL',"http://127.0.0.1:8000")
 ENV_PATH = os.getenv('ENV_PATH')
 PROJECT_ID = os.getenv('PROJECT_ID')
 
+# Above this many features the per-column drift runs on a process pool
+PARALLEL_DRIFT_MIN_COLUMNS = int(os.getenv('PARALLEL_DRIFT_MIN_COLUMNS', "200"))
+
 remote_ws = RemoteWorkspace(EVIDENTLY_SERVER_URL)
 
 try:
@@ -28,23 +34,35 @@ except Exception :
     set_key(ENV_PATH, "PROJECT_ID" ,str(project.id))
 
 
-def monitor_drift(**kwargs):
+def _metric_value(result, prefix):
+    """Value of the first metric of a snapshot whose name starts with `prefix`."""
+    for metric in result.get('metrics', []):
+        name = str(metric.get('metric_name') or metric.get('metric_id') or '')
+        if name.startswith(prefix):
+            return metric.get('value')
+    return None
+
+
+@instrumented("DriftMonitoring")
+def monitor_drift(location=None, **kwargs):
     """
     Function to monitor data drift and regression in the weather data.
     It prepares the data, runs regression tests, and generates a report.
+    Returns a summary of the decay verdict and drift for the location.
     """
     # Load environment variables
-    cut_off_date = os.getenv("CUT_OFF_DATE")
+    cut_off_date = os.getenv(cut_off_key(location))
     data_path = os.getenv("DATA_PATH")
 
     if not cut_off_date or not data_path:
-        raise ValueError("CUT_OFF_DATE and DATA_PATH must be set in the environment variables.")
+        raise ValueError(f"{cut_off_key(location)} and DATA_PATH must be set in the environment variables.")
 
     # Prepare the data
-    data_before, data_after = prepare_data(cut_off_date, data_path)
+    data_before, data_after = prepare_data(cut_off_date, data_path, location=location)
 
     if data_before.empty or data_after.empty:
         raise ValueError("No data available for the specified cut-off date.")
+    set_rows(rows_in=len(data_before) + len(data_after))
     
 
     # Define the features for the regression tests
@@ -68,14 +86,20 @@ def monitor_drift(**kwargs):
     )
 
     # Define the regression tests
-    regression_preset = Report(metrics=[
+    metrics = [
         RMSE(tests=[lte(Reference(absolute=0.3))]),
         MAE(mean_tests=[lte(Reference(absolute=0.3))]),
         ValueDrift(column="rain_sum (mm)"),
-        DataDriftPreset()
-    ],
-    include_tests=True
-    )
+    ]
+
+    # Wide datasets get their per-feature drift from the parallel executor
+    parallel_drift = len(features) >= PARALLEL_DRIFT_MIN_COLUMNS
+    if parallel_drift:
+        drift_report = parallel_drift_report(data_before, data_after, features=features)
+    else:
+        metrics.append(DataDriftPreset())
+
+    regression_preset = Report(metrics=metrics, include_tests=True)
 
     # Run the regression tests
     snapshot = regression_preset.run(reference_data=reference, current_data=current)
@@ -86,11 +110,27 @@ def monitor_drift(**kwargs):
     mae_test_results= result['tests'][0]['status']
     rmse_test_results = result['tests'][1]['status']
 
+    if parallel_drift:
+        drift_share = drift_report["share_of_drifted_columns"]
+    else:
+        drifted_columns = _metric_value(result, "DriftedColumnsCount")
+        drift_share = drifted_columns.get('share') if isinstance(drifted_columns, dict) else None
+
     if 'ti' in kwargs:
         ti = kwargs['ti']
         ti.xcom_push(key='model_decay_test_result', value=str(rmse_test_results))
+        if parallel_drift:
+            ti.xcom_push(key='data_drift_share', value=drift_share)
+
+    return {
+        "location": location,
+        "model_decay_test_result": str(rmse_test_results),
+        "decay": str(rmse_test_results) != "TestStatus.SUCCESS",
+        "drift_share": drift_share,
+        "rmse": _metric_value(result, "RMSE"),
+        "cut_off_date": cut_off_date,
+    }
 
-    
 
 if __name__ == "__main__":
     monitor_drift()
\ No newline at end of file
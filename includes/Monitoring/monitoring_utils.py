@@ -3,22 +3,17 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 import pandas as pd
-from datetime import datetime , date
+from datetime import datetime
 from shared.model_utils import safe_predict_with_model
-from includes.DataIngestion.scrape_data import get_weather_data
 from shared.data_utils import build_fourier 
+from shared.data_snapshot import load_snapshot
+from shared.locations import location_filename
 
 
-def prepare_data(cutoff_date, data_path , start= 8):
+def prepare_data(cutoff_date, data_path , start= 8, location=None):
 
-    # Load the data
-    data = pd.read_csv(os.path.join(data_path, "weather_data.csv"), index_col=0, parse_dates=True)
-    new_data = get_weather_data(start_date=data.index[-1].date(), end_date=date.today())
-
-    
-    # add the newly collected data and save the updated weather_data.csv
-    data = pd.concat([data ,new_data],axis=0)
-    data.to_csv(os.path.join(data_path, "weather_data.csv"))
+    # Load the latest versioned snapshot, ingestion stays the only writer
+    data, _ = load_snapshot(data_path, location_filename(location), location=location)
 
     # Ensure the data is sorted and has no missing values
     data.index = data.index.tz_localize(None)
@@ -33,7 +28,7 @@ def prepare_data(cutoff_date, data_path , start= 8):
     cutoff_date_dt = datetime.strptime(cutoff_date, "%Y-%m-%d")
     horizon = data.index[-1] - data.index[start]
 
-    predicted_df = safe_predict_with_model(data, horizon=horizon.days, start=start)
+    predicted_df = safe_predict_with_model(data, horizon=horizon.days, start=start, location=location)
     full_index = data.index.union(predicted_df.index)
     data = data.reindex(full_index)
     data["predicted_rain (mm)"] = predicted_df
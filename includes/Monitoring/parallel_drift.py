@@ -0,0 +1,190 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+# Same defaults as Evidently's DataDriftPreset for numerical columns:
+# K-S test on small references, normed Wasserstein distance on large ones.
+KS_SAMPLE_LIMIT = 1000
+KS_P_VALUE_THRESHOLD = 0.05
+WASSERSTEIN_THRESHOLD = 0.1
+DRIFT_SHARE = 0.5
+
+# Columns handed to a worker in one task, small enough to balance the pool
+COLUMNS_PER_TASK = int(os.getenv("DRIFT_COLUMNS_PER_TASK", "64"))
+
+# Worker-side views on the shared frames, attached once per process
+_shared = {}
+
+
+def _to_shared(frame: pd.DataFrame):
+    """Copy a numeric frame into a column-major shared memory block."""
+    values = frame.to_numpy(dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    array = np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf, order="F")
+    array[:] = values
+    return shm, (shm.name, values.shape)
+
+
+def _attach(reference_spec, current_spec):
+    for key, (name, shape) in (("reference", reference_spec), ("current", current_spec)):
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order="F"))
+
+
+def column_drift(reference: np.ndarray, current: np.ndarray):
+    """Drift test of a single numerical column, returns (method, score, drifted)."""
+    reference = reference[~np.isnan(reference)]
+    current = current[~np.isnan(current)]
+    if reference.size == 0 or current.size == 0:
+        return "empty", float("nan"), False
+
+    if reference.size <= KS_SAMPLE_LIMIT:
+        p_value = stats.ks_2samp(reference, current).pvalue
+        return "ks", float(p_value), bool(p_value < KS_P_VALUE_THRESHOLD)
+
+    norm = max(np.std(reference), 0.001)
+    distance = stats.wasserstein_distance(reference, current) / norm
+    return "wasserstein", float(distance), bool(distance >= WASSERSTEIN_THRESHOLD)
+
+
+def _drift_task(task):
+    """Run the drift tests of one (location, column block) shard."""
+    location, reference_rows, current_rows, columns = task
+    reference = _shared["reference"][1]
+    current = _shared["current"][1]
+
+    results = []
+    for column_idx, column in columns:
+        method, score, drifted = column_drift(
+            reference[reference_rows[0]:reference_rows[1], column_idx],
+            current[current_rows[0]:current_rows[1], column_idx],
+        )
+        results.append({
+            "location": location,
+            "column": column,
+            "method": method,
+            "score": score,
+            "drift_detected": drifted,
+        })
+    return results
+
+
+def _location_ranges(frame: pd.DataFrame, location_col):
+    """Row ranges of each location in a frame sorted by location."""
+    if location_col is None:
+        return {None: (0, len(frame))}
+    codes = frame[location_col].to_numpy()
+    locations, starts = np.unique(codes, return_index=True)
+    ends = np.append(starts[1:], len(codes))
+    return {loc: (int(start), int(end)) for loc, start, end in zip(locations, starts, ends)}
+
+
+def parallel_drift_report(data_before: pd.DataFrame, data_after: pd.DataFrame,
+                          features=None, location_col=None, max_workers=None):
+    """
+    Compute per-feature drift between two frames on a process pool.
+
+    Columns (and locations when `location_col` is given) are sharded across
+    the workers, which read the frames from shared memory instead of
+    receiving a pickled copy each. Results are merged into one report.
+    """
+    if features is None:
+        features = [col for col in data_before.columns
+                    if col != location_col and pd.api.types.is_numeric_dtype(data_before[col])]
+
+    if location_col is not None:
+        data_before = data_before.sort_values(location_col, kind="stable")
+        data_after = data_after.sort_values(location_col, kind="stable")
+    reference_ranges = _location_ranges(data_before, location_col)
+    current_ranges = _location_ranges(data_after, location_col)
+
+    indexed_features = list(enumerate(features))
+    tasks = []
+    for location, reference_rows in reference_ranges.items():
+        if location not in current_ranges:
+            continue
+        for start in range(0, len(indexed_features), COLUMNS_PER_TASK):
+            tasks.append((location, reference_rows, current_ranges[location],
+                          indexed_features[start:start + COLUMNS_PER_TASK]))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    reference_shm, reference_spec = _to_shared(data_before[features])
+    current_shm, current_spec = _to_shared(data_after[features])
+    try:
+        if max_workers == 1:
+            _attach(reference_spec, current_spec)
+            shards = [_drift_task(task) for task in tasks]
+            _shared.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach,
+                                     initargs=(reference_spec, current_spec)) as pool:
+                shards = list(pool.map(_drift_task, tasks))
+    finally:
+        for shm in (reference_shm, current_shm):
+            shm.close()
+            shm.unlink()
+
+    columns = [result for shard in shards for result in shard]
+    drifted = sum(result["drift_detected"] for result in columns)
+    share = drifted / len(columns) if columns else 0.0
+    elapsed = time.perf_counter() - started
+
+    logger.info(f"Drift computed on {len(columns)} columns with {max_workers} workers in {elapsed:.2f}s")
+    return {
+        "columns": columns,
+        "number_of_columns": len(columns),
+        "number_of_drifted_columns": drifted,
+        "share_of_drifted_columns": share,
+        "dataset_drift": share >= DRIFT_SHARE,
+        "workers": max_workers,
+        "elapsed_seconds": elapsed,
+    }
+
+
+def measure_scaling(data_before: pd.DataFrame, data_after: pd.DataFrame,
+                    features=None, location_col=None, max_workers=None):
+    """Time the drift computation from 1 up to `max_workers` processes."""
+    max_workers = max_workers or os.cpu_count() or 1
+    timings = {}
+    workers = 1
+    while workers <= max_workers:
+        report = parallel_drift_report(data_before, data_after, features,
+                                       location_col=location_col, max_workers=workers)
+        timings[workers] = report["elapsed_seconds"]
+        workers *= 2
+    if max_workers not in timings:
+        report = parallel_drift_report(data_before, data_after, features,
+                                       location_col=location_col, max_workers=max_workers)
+        timings[max_workers] = report["elapsed_seconds"]
+
+    baseline = timings[1]
+    return {workers: {"seconds": seconds, "speedup": baseline / seconds if seconds else float("nan")}
+            for workers, seconds in timings.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure parallel drift scaling on synthetic data.")
+    parser.add_argument("--rows", type=int, default=730)
+    parser.add_argument("--columns", type=int, default=2000)
+    parser.add_argument("--max_workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    columns = [f"feature_{i}" for i in range(args.columns)]
+    before = pd.DataFrame(rng.normal(size=(args.rows, args.columns)), columns=columns)
+    after = pd.DataFrame(rng.normal(0.1, 1.0, size=(args.rows, args.columns)), columns=columns)
+
+    for workers, timing in measure_scaling(before, after, max_workers=args.max_workers).items():
+        print(f"{workers} workers: {timing['seconds']:.2f}s (x{timing['speedup']:.2f})")
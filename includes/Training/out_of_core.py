@@ -0,0 +1,405 @@
+"""
+Out-of-core training of a global rain model from a quantised CatBoost pool.
+
+The monthly partitions of every location are streamed one at a time into a
+TSV file of lagged features, with the tail of the previous partition as lag
+context, then quantised from disk into a CatBoost pool file. Only the
+quantised pool (one byte per feature value) is ever held in memory, and it is
+reused by every retrain with the same feature set and partitions.
+
+Training can be bounded by a wall-clock budget and stopped early on a
+held-out tail of each location; boosting snapshots let a retried task
+resume where the failed attempt stopped.
+
+    python includes/Training/out_of_core.py --locations brazzaville pointe_noire --budget_seconds 1800
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.data_snapshot import read_partition_manifest, iter_partitions, hourly_features_path
+from shared.instrumentation import instrument_stage, stage_metrics
+from shared.locations import get_location, location_slugs
+from shared.variables import hourly_covariate_cols
+from includes.Caching.stage_cache import config_digest, file_digest
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[2]
+DATA_PATH = parent_dir / "data"
+PARTITIONS_PATH = DATA_PATH / "partitions"
+POOLS_PATH = Path(os.getenv("POOLS_PATH", parent_dir / "data" / "pools"))
+POOL_FILENAME = "pool.quantized"
+EVAL_POOL_FILENAME = "eval.quantized"
+# Boosting snapshots, at a path derived from the pool and params so a retried task resumes
+SNAPSHOTS_PATH = Path(os.getenv("TRAINING_SNAPSHOTS_PATH", parent_dir / "data" / "training_snapshots"))
+
+MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
+# Kept apart from the served darts models, which model_utils picks by recency
+OUT_OF_CORE_EXPERIMENT_NAME = os.getenv(
+    "OUT_OF_CORE_EXPERIMENT_NAME",
+    f"{os.getenv('EXPERIMENT_NAME', 'Weather_Forecast_Model_Training')}_out_of_core",
+)
+
+BORDER_COUNT = 254
+FOURIER_FREQ = 365.25
+FOURIER_ORDER = 4
+# Location features of the global model
+LOCATION_FEATURES = ["latitude", "longitude"]
+# Caps CatBoost's RAM while quantising and training, e.g. "4gb"
+USED_RAM_LIMIT = os.getenv("CATBOOST_USED_RAM_LIMIT")
+
+# Training budget: wall-clock seconds per attempt, and the last days of each
+# location held out to stop early on validation loss. 0 disables either.
+TRAINING_BUDGET_SECONDS = float(os.getenv("TRAINING_BUDGET_SECONDS", "0"))
+HOLDOUT_DAYS = int(os.getenv("HOLDOUT_DAYS", "90"))
+EARLY_STOPPING_ROUNDS = int(os.getenv("EARLY_STOPPING_ROUNDS", "50"))
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "60"))
+
+
+def feature_names(params):
+    """Feature columns in darts' layout: target lags, then past covariate lags, lag-major and oldest first."""
+    names = [f"{params['target']}_target_lag{-lag}" for lag in range(params["lags"], 0, -1)]
+    names += [f"{col}_pastcov_lag{-lag}"
+              for lag in range(params["lags_past_covariates"], 0, -1)
+              for col in params["past_covariates"]]
+    return names + LOCATION_FEATURES
+
+
+def hourly_columns(params):
+    """Past covariates of `params` coming from the hourly ingestion rather than the partitions."""
+    return [col for col in params["past_covariates"] if col in hourly_covariate_cols]
+
+
+def load_hourly_features(location, params, data_path=DATA_PATH):
+    """Hourly aggregates of a location the feature set needs, None when it needs none."""
+    columns = hourly_columns(params)
+    if not columns:
+        return None
+    path = hourly_features_path(data_path, location)
+    if not path.is_file():
+        raise FileNotFoundError(f"No hourly features at {path}, run the hourly ingestion to backfill them.")
+    return pd.read_parquet(path, columns=columns)
+
+
+def pool_key(params, manifests, holdout_days=0, hourly_digests=None):
+    """
+    Hash of the feature set, the holdout and the content of every partition the pool is built from,
+    and of the hourly features files joined to them.
+    """
+    digest = hashlib.sha256()
+    spec = {key: params[key] for key in ("target", "past_covariates", "lags", "lags_past_covariates",
+                                         "output_chunk_length")}
+    digest.update(json.dumps({**spec, "border_count": BORDER_COUNT, "fourier": [FOURIER_FREQ, FOURIER_ORDER],
+                              "features": feature_names(params), "holdout_days": holdout_days}, sort_keys=True).encode("utf-8"))
+    for location in sorted(manifests):
+        digest.update(location.encode("utf-8"))
+        for month in sorted(manifests[location]["partitions"]):
+            digest.update(manifests[location]["partitions"][month]["content_hash"].encode("utf-8"))
+        if hourly_digests:
+            digest.update(hourly_digests[location].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _add_calendar_features(partition, start_date):
+    """Same features as train.prepare_features, with time counted in days from the first stored day."""
+    frame = partition.copy()
+    index = frame.index.tz_localize(None) if frame.index.tz is not None else frame.index
+    frame["day_of_year"] = index.dayofyear
+    k = 2 * np.pi * (1 / FOURIER_FREQ) * (index - start_date).days.to_numpy(dtype=np.float32)
+    for i in range(1, FOURIER_ORDER + 1):
+        frame[f"sin_{FOURIER_FREQ}_{i}"] = np.sin(i * k)
+        frame[f"cos_{FOURIER_FREQ}_{i}"] = np.cos(i * k)
+    return frame
+
+
+def lagged_rows(frame, params):
+    """
+    Feature and label matrices of every complete window of `frame`, with the position of each origin.
+
+    Row `i` is the forecast origin `i`: the target and covariate lags before
+    it as features, the next `output_chunk_length` targets as labels.
+    """
+    lags, cov_lags, horizon = params["lags"], params["lags_past_covariates"], params["output_chunk_length"]
+    target = frame[params["target"]].to_numpy(dtype=np.float32)
+    covariates = frame[params["past_covariates"]].to_numpy(dtype=np.float32)
+
+    first = max(lags, cov_lags)
+    origins = np.arange(first, len(frame) - horizon + 1)
+    if len(origins) == 0:
+        return None, None, None
+
+    target_lags = sliding_window_view(target, lags)[origins - lags]
+    # (windows, covariates, lags) -> lag-major, oldest first
+    cov_windows = sliding_window_view(covariates, cov_lags, axis=0)[origins - cov_lags]
+    cov_features = cov_windows.transpose(0, 2, 1).reshape(len(origins), -1)
+    labels = sliding_window_view(target, horizon)[origins]
+    return np.hstack([target_lags, cov_features]), labels, origins
+
+
+def stream_location(location, partitions_dir, manifest, params, out, eval_out=None, holdout_days=0,
+                    data_path=DATA_PATH):
+    """
+    Append the lagged rows of one location to `out`, one partition at a time.
+
+    Rows whose origin falls in the last `holdout_days` days go to `eval_out`
+    instead. The hourly aggregates among the covariates are joined to each
+    partition, days without them leave their windows out. Returns the number
+    of training and holdout rows written.
+    """
+    context = max(params["lags"], params["lags_past_covariates"]) + params["output_chunk_length"] - 1
+    columns = [params["target"], *params["past_covariates"]]
+    coordinates = get_location(location)
+    start_date = pd.Timestamp(min(entry["first_date"] for entry in manifest["partitions"].values()))
+    start_date = start_date.tz_localize(None) if start_date.tz is not None else start_date
+    last_date = pd.Timestamp(max(entry["last_date"] for entry in manifest["partitions"].values()))
+    holdout_start = last_date - pd.Timedelta(days=holdout_days) if holdout_days else None
+    hourly = load_hourly_features(location, params, data_path)
+
+    tail, rows, eval_rows = None, 0, 0
+    for partition in iter_partitions(partitions_dir, manifest):
+        if hourly is not None:
+            if partition.index.tz is None and hourly.index.tz is not None:
+                hourly.index = hourly.index.tz_convert("UTC").tz_localize(None)
+            partition = partition.join(hourly[hourly.columns.difference(partition.columns)], how="left")
+        partition = _add_calendar_features(partition.sort_index(), start_date)[columns]
+        # The previous partition's tail gives the first days their lag context
+        buffer = partition if tail is None else pd.concat([tail, partition])
+        features, labels, origins = lagged_rows(buffer, params)
+        tail = buffer.iloc[-context:]
+        if features is None:
+            continue
+
+        complete = ~(np.isnan(features).any(axis=1) | np.isnan(labels).any(axis=1))
+        if not complete.any():
+            continue
+        location_values = np.tile([coordinates[key] for key in LOCATION_FEATURES], (int(complete.sum()), 1))
+        block = np.hstack([labels[complete], features[complete], location_values])
+
+        training = np.ones(len(block), dtype=bool)
+        if holdout_start is not None:
+            origin_dates = buffer.index[origins[complete]]
+            held_out = origin_dates >= holdout_start
+            # Windows whose labels reach into the holdout are left out of both sets
+            training = origin_dates < holdout_start - pd.Timedelta(days=params["output_chunk_length"] - 1)
+            np.savetxt(eval_out, block[held_out], delimiter="\t", fmt="%.6g")
+            eval_rows += int(held_out.sum())
+        np.savetxt(out, block[training], delimiter="\t", fmt="%.6g")
+        rows += int(training.sum())
+    return rows, eval_rows
+
+
+def write_column_description(path, params):
+    horizon = params["output_chunk_length"]
+    with open(path, "w") as f:
+        for i in range(horizon):
+            f.write(f"{i}\tLabel\n")
+        for i, name in enumerate(feature_names(params), start=horizon):
+            f.write(f"{i}\tNum\t{name}\n")
+
+
+def build_pool(locations, params, partitions_path=PARTITIONS_PATH, pools_path=POOLS_PATH, holdout_days=0):
+    """
+    Quantised pool of every location's partitions, built once per feature set and data version.
+
+    With `holdout_days`, the last days of each location go to an evaluation
+    pool quantised with the training borders. Returns the pool path, the
+    evaluation pool path (None without holdout), the key and whether an
+    existing pool was reused.
+    """
+    from catboost.utils import quantize
+
+    manifests = {location: read_partition_manifest(Path(partitions_path) / location)[0] for location in locations}
+    # A backfill of the hourly features changes the rows, so it invalidates the pool
+    hourly_digests = ({location: file_digest(hourly_features_path(DATA_PATH, location)) for location in locations}
+                      if hourly_columns(params) else None)
+    key = pool_key(params, manifests, holdout_days, hourly_digests)
+    pool_dir = Path(pools_path) / key
+    pool_path = pool_dir / POOL_FILENAME
+    eval_path = pool_dir / EVAL_POOL_FILENAME if holdout_days else None
+    if pool_path.is_file():
+        logger.info(f"⏭ Reusing quantised pool {key[:12]}.")
+        return pool_path, eval_path, key, True
+
+    tmp_dir = Path(pools_path) / f".{key}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    tsv_path, eval_tsv_path, cd_path = tmp_dir / "rows.tsv", tmp_dir / "eval.tsv", tmp_dir / "pool.cd"
+
+    write_column_description(cd_path, params)
+    rows = eval_rows = 0
+    with open(tsv_path, "w") as out, open(eval_tsv_path, "w") as eval_out:
+        for location in locations:
+            location_rows, location_eval_rows = stream_location(
+                location, Path(partitions_path) / location, manifests[location], params, out, eval_out, holdout_days)
+            rows, eval_rows = rows + location_rows, eval_rows + location_eval_rows
+    if rows == 0:
+        raise ValueError(f"No complete training window in the partitions of {locations}.")
+
+    # Quantised from the file in blocks, the raw rows never sit in memory at once
+    pool = quantize(str(tsv_path), column_description=str(cd_path), delimiter="\t",
+                    border_count=BORDER_COUNT, used_ram_limit=USED_RAM_LIMIT)
+    pool.save(str(tmp_dir / POOL_FILENAME))
+    if holdout_days and eval_rows:
+        # Same borders as the training pool, CatBoost requires it for the eval set
+        pool.save_quantization_borders(str(tmp_dir / "borders.tsv"))
+        quantize(str(eval_tsv_path), column_description=str(cd_path), delimiter="\t",
+                 input_borders=str(tmp_dir / "borders.tsv"), used_ram_limit=USED_RAM_LIMIT
+                 ).save(str(tmp_dir / EVAL_POOL_FILENAME))
+    elif holdout_days:
+        raise ValueError(f"No complete window in the last {holdout_days} days of {locations} to hold out.")
+    del pool
+    tsv_path.unlink()
+    eval_tsv_path.unlink()
+
+    if pool_dir.exists():
+        # Built concurrently by another retrain, same key so same content
+        shutil.rmtree(tmp_dir)
+    else:
+        os.replace(tmp_dir, pool_dir)
+    logger.info(f"📦 Quantised pool {key[:12]} built from {rows} rows ({eval_rows} held out) "
+                f"of {len(locations)} locations.")
+    return pool_path, eval_path, key, False
+
+
+class WallClockBudget:
+    """CatBoost callback stopping the boosting once the attempt has used its time budget."""
+
+    def __init__(self, budget_seconds):
+        self.budget_seconds = budget_seconds
+        self.started = time.perf_counter()
+        self.first_iteration = None
+        self.last_iteration = None
+        self.exhausted = False
+
+    def after_iteration(self, info):
+        if self.first_iteration is None:
+            self.first_iteration = info.iteration
+        self.last_iteration = info.iteration
+        self.exhausted = bool(self.budget_seconds) and time.perf_counter() - self.started >= self.budget_seconds
+        return not self.exhausted
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def snapshot_path(key, params, snapshots_path=SNAPSHOTS_PATH):
+    """Same pool and params give the same path, so a retried task finds the snapshot of the failed attempt."""
+    return Path(snapshots_path) / f"{key[:16]}_{config_digest(params)[:16]}.cbsnapshot"
+
+
+def train_out_of_core(locations=None, params=None, partitions_path=PARTITIONS_PATH, pools_path=POOLS_PATH,
+                      budget_seconds=TRAINING_BUDGET_SECONDS, holdout_days=HOLDOUT_DAYS):
+    """
+    Train a global MultiRMSE CatBoost model over `locations` from a quantised pool file.
+
+    Boosting stops at `n_estimators`, when the loss on the held-out tail
+    stops improving, or when `budget_seconds` of wall-clock time are used,
+    whichever comes first. Snapshots are written every SNAPSHOT_INTERVAL
+    seconds and an interrupted or retried run resumes from the last one.
+    """
+    import mlflow
+    from catboost import CatBoostRegressor, Pool
+
+    if params is None:
+        from includes.Training.train import params
+    locations = locations or [location for location in location_slugs()
+                              if (Path(partitions_path) / location / "manifest.json").is_file()]
+
+    with instrument_stage("PoolBuilding") as pool_stage:
+        pool_path, eval_path, key, reused = build_pool(locations, params, partitions_path, pools_path, holdout_days)
+        pool_stage["cache_hits"] = int(reused)
+
+    snapshot = snapshot_path(key, params)
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    resumed = snapshot.is_file()
+    if resumed:
+        logger.info(f"↩ Resuming training from snapshot {snapshot.name}.")
+
+    with instrument_stage("OutOfCoreFitting") as fit_stage:
+        pool = Pool(f"quantized://{pool_path}")
+        eval_pool = Pool(f"quantized://{eval_path}") if eval_path is not None else None
+        fit_stage["rows_in"] = pool.num_row()
+        model = CatBoostRegressor(
+            loss_function="MultiRMSE",
+            iterations=params["n_estimators"],
+            learning_rate=params["learning_rate"],
+            depth=params["max_depth"],
+            random_seed=params["random_state"],
+            used_ram_limit=USED_RAM_LIMIT,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS if eval_pool is not None else None,
+            use_best_model=eval_pool is not None,
+            save_snapshot=True,
+            snapshot_file=str(snapshot),
+            snapshot_interval=SNAPSHOT_INTERVAL,
+            train_dir=str(snapshot.with_suffix("")),
+            verbose=100,
+        )
+        budget = WallClockBudget(budget_seconds)
+        model.fit(pool, eval_set=eval_pool, callbacks=[budget])
+
+    # The run is complete, a later retrain must start from tree zero
+    snapshot.unlink(missing_ok=True)
+    shutil.rmtree(snapshot.with_suffix(""), ignore_errors=True)
+
+    iterations_run = budget.last_iteration + 1 if budget.last_iteration is not None else 0
+    attempt_iterations = iterations_run - (budget.first_iteration or 0)
+    seconds_per_iteration = budget.elapsed / max(attempt_iterations, 1)
+    if budget.exhausted:
+        stopped_by = "time_budget"
+    elif iterations_run < params["n_estimators"]:
+        stopped_by = "early_stopping"
+    else:
+        stopped_by = "iterations"
+    logger.info(f"🛑 Boosting stopped by {stopped_by} after {iterations_run}/{params['n_estimators']} iterations.")
+
+    model_dir = parent_dir / "models" / "rain_forecasting_model_global"
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model.save_model(str(model_dir / "catboost_model.cbm"))
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(OUT_OF_CORE_EXPERIMENT_NAME)
+    with mlflow.start_run():
+        mlflow.set_tags({"training_mode": "out_of_core", "locations": ",".join(locations), "pool_key": key,
+                         "stopped_by": stopped_by})
+        mlflow.log_params({**params, "budget_seconds": budget_seconds, "holdout_days": holdout_days,
+                           "early_stopping_rounds": EARLY_STOPPING_ROUNDS})
+        metrics = {
+            "pool_rows": pool.num_row(),
+            "pool_size_mb": pool_path.stat().st_size / (1024 * 1024),
+            "pool_reused": int(reused),
+            "iterations_run": iterations_run,
+            "best_iteration": model.get_best_iteration() if eval_pool is not None else iterations_run - 1,
+            "resumed_from_snapshot": int(resumed),
+            # Boosting time the stop avoided, at this attempt's speed
+            "time_saved_seconds": (params["n_estimators"] - iterations_run) * seconds_per_iteration,
+            **stage_metrics(pool_stage),
+            **stage_metrics(fit_stage),
+        }
+        if eval_pool is not None:
+            metrics["holdout_multirmse"] = model.get_best_score()["validation"]["MultiRMSE"]
+        mlflow.log_metrics(metrics)
+        mlflow.log_artifacts(str(model_dir))
+        logger.info(f"📦 Global model logged to MLflow, peak RSS up {fit_stage['peak_rss_increase_mb'] or 0:.0f} MB while fitting.")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the global rain model from a quantised pool on disk.")
+    parser.add_argument("--locations", nargs="*", default=None, help="Locations to train on, defaults to every partitioned one.")
+    parser.add_argument("--budget_seconds", type=float, default=TRAINING_BUDGET_SECONDS, help="Wall-clock budget, 0 for none.")
+    parser.add_argument("--holdout_days", type=int, default=HOLDOUT_DAYS, help="Days held out for early stopping, 0 for none.")
+    args = parser.parse_args()
+    train_out_of_core(args.locations, budget_seconds=args.budget_seconds, holdout_days=args.holdout_days)
@@ -0,0 +1,277 @@
+"""
+Prioritised retraining of the decayed location models.
+
+Each drift verdict of `monitor_drift` becomes a retrain job scored on the
+drift severity, the age of the model and the importance of the location.
+Jobs wait in a priority queue, one per location, and are started on a
+bounded process pool only while the host has CPU and memory to spare, so
+the most degraded models are retrained first and a burst of drift events
+can't overload the workers.
+
+    python includes/Training/retrain_scheduler.py drift_results.json   # print the retraining order
+"""
+import os
+import sys
+import time
+import heapq
+import logging
+import itertools
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.locations import get_location
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at once, each one is a full model training
+RETRAIN_MAX_WORKERS = int(os.getenv("RETRAIN_MAX_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+# No new job starts while the 1-minute load per CPU, running jobs included, is above this
+RETRAIN_CPU_BUDGET = float(os.getenv("RETRAIN_CPU_BUDGET", "0.8"))
+# CPUs a running training is counted for, the host's CPUs shared by the workers by default
+RETRAIN_JOB_THREADS = int(os.getenv("RETRAIN_JOB_THREADS", str(max(1, (os.cpu_count() or 1) // RETRAIN_MAX_WORKERS))))
+# Memory a training needs, a job only starts if this much is available
+RETRAIN_JOB_MEMORY_MB = float(os.getenv("RETRAIN_JOB_MEMORY_MB", "2048"))
+# Queued jobs beyond this are refused, the lowest priorities first
+RETRAIN_QUEUE_LIMIT = int(os.getenv("RETRAIN_QUEUE_LIMIT", "16"))
+# A model this old gets the full age score
+RETRAIN_MAX_MODEL_AGE_DAYS = float(os.getenv("RETRAIN_MAX_MODEL_AGE_DAYS", "180"))
+RETRAIN_AGE_WEIGHT = float(os.getenv("RETRAIN_AGE_WEIGHT", "0.5"))
+# Seconds between two budget checks while jobs are waiting
+RETRAIN_POLL_INTERVAL = float(os.getenv("RETRAIN_POLL_INTERVAL", "5"))
+
+
+def model_age_days(cut_off_date, today=None):
+    """Days since the training cut-off, None when the location was never trained."""
+    if not cut_off_date:
+        return None
+    return ((today or date.today()) - date.fromisoformat(str(cut_off_date)[:10])).days
+
+
+def retrain_priority(drift_result, today=None):
+    """
+    Priority of retraining a location from its drift verdict, higher first.
+
+    Severity is 1 for a failed regression test plus the share of drifted
+    features. The model age adds up to RETRAIN_AGE_WEIGHT, a location never
+    trained counts as the oldest. The sum is weighted by the location's
+    importance.
+    """
+    severity = (1.0 if drift_result.get("decay") else 0.0) + (drift_result.get("drift_share") or 0.0)
+    age = model_age_days(drift_result.get("cut_off_date"), today)
+    age_score = 1.0 if age is None else min(age / RETRAIN_MAX_MODEL_AGE_DAYS, 1.0)
+    importance = get_location(drift_result["location"]).get("importance", 1.0)
+    return importance * (severity + RETRAIN_AGE_WEIGHT * age_score)
+
+
+class RetrainQueue:
+    """
+    Priority queue of retrain jobs with one job per location.
+
+    Pushing a location already queued keeps the higher priority. When the
+    queue is full, a job ranking below every queued one is refused and a
+    higher one evicts the lowest, which is left to the next monitoring run.
+    """
+
+    def __init__(self, limit=RETRAIN_QUEUE_LIMIT):
+        self.limit = limit
+        self._heap = []
+        # location -> (priority, job) of the live entries, heap entries not matching are stale
+        self._jobs = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, location):
+        return location in self._jobs
+
+    def _lowest(self):
+        return min(self._jobs, key=lambda location: self._jobs[location][0])
+
+    def push(self, location, priority, job=None):
+        """Queue a job, returns False when back-pressure refused it."""
+        if location in self._jobs:
+            if priority <= self._jobs[location][0]:
+                return True
+        elif len(self._jobs) >= self.limit:
+            lowest = self._lowest()
+            if priority <= self._jobs[lowest][0]:
+                logger.warning(f"Retrain queue full, {location} (priority {priority:.2f}) deferred.")
+                return False
+            logger.warning(f"Retrain queue full, {lowest} deferred for {location}.")
+            del self._jobs[lowest]
+        self._jobs[location] = (priority, job)
+        # Ties go to the job queued first
+        heapq.heappush(self._heap, (-priority, next(self._counter), location))
+        return True
+
+    def pop(self):
+        """(location, priority, job) of the highest priority job."""
+        while self._heap:
+            negative_priority, _, location = heapq.heappop(self._heap)
+            entry = self._jobs.get(location)
+            if entry is not None and entry[0] == -negative_priority:
+                del self._jobs[location]
+                return location, entry[0], entry[1]
+        raise IndexError("pop from an empty retrain queue")
+
+    def locations(self):
+        """Queued locations, highest priority first."""
+        return sorted(self._jobs, key=lambda location: -self._jobs[location][0])
+
+
+def _read_number(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    # cgroup v2 writes "max" when there is no limit
+    return None if value == "max" else int(value)
+
+
+def _cgroup_memory_mb():
+    """Memory left under the container's cgroup limit (v2, then v1), None when there is no limit."""
+    for limit_path, usage_path in (("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+                                   ("/sys/fs/cgroup/memory/memory.limit_in_bytes",
+                                    "/sys/fs/cgroup/memory/memory.usage_in_bytes")):
+        limit, usage = _read_number(limit_path), _read_number(usage_path)
+        # v1 reports an unlimited group as a huge page-aligned number
+        if limit is not None and usage is not None and limit < 2**60:
+            return (limit - usage) / 2**20
+    return None
+
+
+def _available_memory_mb():
+    """
+    MemAvailable of the host, capped by what the cgroup limit leaves.
+
+    MemFree alone ignores the page cache the kernel would reclaim, and the
+    host figure ignores the container limit the workers are killed at.
+    """
+    available = float("inf")
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    cgroup = _cgroup_memory_mb()
+    return available if cgroup is None else min(available, cgroup)
+
+
+def _cpu_load():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return 0.0
+
+
+class RetrainScheduler:
+    """Run the queued retrain jobs on a bounded process pool within the CPU and memory budgets."""
+
+    def __init__(self, max_workers=RETRAIN_MAX_WORKERS, cpu_budget=RETRAIN_CPU_BUDGET,
+                 job_memory_mb=RETRAIN_JOB_MEMORY_MB, queue=None, poll_interval=RETRAIN_POLL_INTERVAL,
+                 job_threads=RETRAIN_JOB_THREADS):
+        self.max_workers = max_workers
+        self.cpu_budget = cpu_budget
+        self.job_memory_mb = job_memory_mb
+        self.job_threads = job_threads
+        self.queue = queue if queue is not None else RetrainQueue()
+        self.poll_interval = poll_interval
+        self.running = {}
+
+    def submit(self, drift_result, job=None):
+        """Queue the retraining of a decayed location, a location already training is skipped."""
+        location = drift_result["location"]
+        if location in self.running.values():
+            logger.info(f"{location} is already retraining, drift event dropped.")
+            return False
+        return self.queue.push(location, retrain_priority(drift_result), job)
+
+    def _has_budget(self):
+        # One job always runs, or a busy host would never retrain anything
+        if not self.running:
+            return True
+        # The load average lags behind jobs just started, so their threads are counted as well
+        committed = len(self.running) * self.job_threads / (os.cpu_count() or 1)
+        return (max(_cpu_load(), committed) < self.cpu_budget
+                and _available_memory_mb() >= self.job_memory_mb)
+
+    def run(self, train_fn):
+        """
+        Retrain the queued locations, highest priority first, with `train_fn(location, job)`.
+
+        `train_fn` runs in a worker process and must be picklable. At most one
+        job starts per poll, so the budgets see the load of the previous one.
+        A failed job is logged and the others carry on; once the pool has
+        drained, any failure is raised. Returns the results of the jobs.
+        """
+        results, failures = [], {}
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            while len(self.queue) or self.running:
+                if len(self.queue) and len(self.running) < self.max_workers and self._has_budget():
+                    location, priority, job = self.queue.pop()
+                    logger.info(f"🔁 Retraining {location} (priority {priority:.2f}).")
+                    self.running[pool.submit(train_fn, location, job)] = location
+
+                done, _ = wait(self.running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    location = self.running.pop(future)
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Retraining of {location} failed: {e}")
+                        failures[location] = str(e)
+
+        logger.info(f"Retrained {len(results)} locations in {time.perf_counter() - started:.0f}s, "
+                    f"{len(failures)} failed.")
+        if failures:
+            raise RuntimeError(f"Retraining failed for {len(failures)} locations: {failures}")
+        return results
+
+
+def retrain_location(location, dataset):
+    """Worker side of a job: train a location on its validated hand-off file, cached on its content."""
+    import mlflow
+    from pathlib import Path
+    from includes.Caching.stage_cache import run_cached
+    from includes.Training.train import train_and_log_model, params
+    from shared.data_snapshot import training_inputs
+    from shared.dataset_handoff import DATA_PATH
+
+    dataset_path = Path(DATA_PATH) / dataset["filename"]
+
+    def train():
+        train_and_log_model(dataset_path=dataset_path, dataset_hash=dataset["content_hash"], location=location)
+        return {"location": location, "run_id": mlflow.last_active_run().info.run_id}
+
+    return run_cached(f"ModelTraining_{location}", train, inputs=training_inputs(dataset_path, DATA_PATH, location),
+                      config=params)
+
+
+def prioritise(drift_results, limit=RETRAIN_QUEUE_LIMIT):
+    """Decayed locations in retraining order, the ones back-pressure refused left out."""
+    queue = RetrainQueue(limit)
+    for result in drift_results:
+        if result["decay"]:
+            queue.push(result["location"], retrain_priority(result))
+    return queue.locations()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Order the retraining of decayed locations.")
+    parser.add_argument("drift_results", help="JSON file with the list of monitor_drift results.")
+    args = parser.parse_args()
+
+    with open(args.drift_results) as f:
+        drift_results = json.load(f)
+    for location in prioritise(drift_results):
+        print(location)
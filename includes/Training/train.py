@@ -4,21 +4,27 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
-from dotenv import set_key, load_dotenv
+from dotenv import load_dotenv
 
 from darts import TimeSeries
 from darts.models import CatBoostModel
 
 import mlflow
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from shared.dataset_handoff import read_dataset
+from shared.data_snapshot import join_hourly_features
+from shared.variables import USE_HOURLY_FEATURES, hourly_covariate_cols
+from shared.locations import resolve_location, save_cut_off_date
+from shared.instrumentation import instrumented, instrument_stage, set_rows, stage_metrics
 load_dotenv()
 
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
 EXPERIMENT_NAME = os.getenv("EXPERIMENT_NAME", "Weather_Forecast_Model_Training")
 ENV_PATH = os.getenv('ENV_PATH')
 
-# MLflow setup
+# MLflow setup, the experiment is only looked up on the server when training
 mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-mlflow.set_experiment(EXPERIMENT_NAME)
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -53,6 +59,8 @@ params = {
     "output_chunk_length": 7,
     "random_state": 42,
 }
+if USE_HOURLY_FEATURES:
+    params["past_covariates"] = params["past_covariates"] + hourly_covariate_cols
 
 # Fourier feature creation
 def fourier_features(index, freq, order):
@@ -65,29 +73,18 @@ def fourier_features(index, freq, order):
     return pd.DataFrame(features, index=index)
 
 
-
-def train_and_log_model(csv_path: str = csv_path, params: dict = params):
-
-    # Load data
-    weather_df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
-
-    # Preprocess
-    logger.info("⚙ Loading the weather data and preprocessing...")
+def prepare_features(weather_df: pd.DataFrame):
+    """Drop incomplete days and add the calendar and Fourier features."""
     weather_df = weather_df.dropna()
     weather_df.index = pd.to_datetime(weather_df.index)
     weather_df["day_of_year"] = weather_df.index.dayofyear
 
-    # Fourier features
     fourier_df = fourier_features(weather_df.index, 365.25, 4)
-    weather_df = pd.concat([fourier_df, weather_df], axis=1)
+    return pd.concat([fourier_df, weather_df], axis=1)
 
-    # TimeSeries conversion
-    rain_series = TimeSeries.from_dataframe(weather_df, value_cols=[params["target"]])
-    past_covariates = TimeSeries.from_dataframe(weather_df, value_cols=params["past_covariates"])
 
-    # Train
-    logger.info("🔍 Training the model...")
-    model = CatBoostModel(
+def build_model(params: dict = params):
+    return CatBoostModel(
         lags=params["lags"],
         lags_past_covariates=params["lags_past_covariates"],
         output_chunk_length= params["output_chunk_length"],
@@ -98,21 +95,54 @@ def train_and_log_model(csv_path: str = csv_path, params: dict = params):
         verbose=-1,
         multi_models=True,
     )
-    model.fit(rain_series, past_covariates=past_covariates)
+
+
+@instrumented("ModelTraining")
+def train_and_log_model(csv_path: str = csv_path, params: dict = params, dataset_path: str = None,
+                        dataset_hash: str = None, location: str = None):
+
+    location = resolve_location(location)
+    # Load data, preferably the typed Arrow hand-off of the fetching task
+    if dataset_path is not None:
+        weather_df = read_dataset(dataset_path, expected_hash=dataset_hash)
+    else:
+        weather_df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    if USE_HOURLY_FEATURES:
+        weather_df = join_hourly_features(weather_df, DATA_PATH, location)
+    set_rows(rows_in=len(weather_df))
+
+    # Preprocess
+    logger.info("⚙ Loading the weather data and preprocessing...")
+    weather_df = prepare_features(weather_df)
+
+    # TimeSeries conversion
+    rain_series = TimeSeries.from_dataframe(weather_df, value_cols=[params["target"]])
+    past_covariates = TimeSeries.from_dataframe(weather_df, value_cols=params["past_covariates"])
+
+    # Train
+    logger.info("🔍 Training the model...")
+    model = build_model(params)
+    with instrument_stage("ModelFitting", rows_in=len(rain_series)) as fit_stage:
+        model.fit(rain_series, past_covariates=past_covariates)
     logger.info("✅ Model training completed successfully.")
 
     # save the cutoff date
     cut_off_date = weather_df.index[-1].strftime("%Y-%m-%d")
-    set_key(ENV_PATH, "CUT_OFF_DATE", cut_off_date)
+    save_cut_off_date(location, cut_off_date, ENV_PATH)
 
     # Save & log to MLflow
-    model_path = parent_dir / "models" / "rain_forecasting_model"
+    model_dir = "rain_forecasting_model" if location is None else f"rain_forecasting_model_{location}"
+    model_path = parent_dir / "models" / model_dir
     model_path.mkdir(parents=True, exist_ok=True)
     model.save(str(model_path / "catboost_model.pkl"))
 
+    mlflow.set_experiment(EXPERIMENT_NAME)
     with mlflow.start_run():
+        if location is not None:
+            mlflow.set_tag("location", location)
         mlflow.log_params(params)
         mlflow.log_metric("rmse", params["experimentation_rmse"])
+        mlflow.log_metrics(stage_metrics(fit_stage))
         mlflow.log_artifacts(str(model_path))
         logger.info("📦 Model and metrics logged to MLflow.")
 
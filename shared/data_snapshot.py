@@ -0,0 +1,138 @@
+import os
+import json
+import logging
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+from shared.dataset_handoff import read_if_source
+from shared.locations import location_filename, location_key
+from shared.variables import USE_HOURLY_FEATURES
+
+logger = logging.getLogger(__name__)
+
+
+def _find_dvc_root(path: Path):
+    for candidate in [path, *path.parents]:
+        if (candidate / ".dvc").is_dir():
+            return candidate
+    return None
+
+
+def _cache_object(dvc_root: Path, md5: str):
+    """Locate a file in the DVC cache (3.x layout first, then 2.x)."""
+    cache_dir = Path(os.getenv("DVC_CACHE_DIR", dvc_root / ".dvc" / "cache"))
+    for candidate in (cache_dir / "files" / "md5" / md5[:2] / md5[2:],
+                      cache_dir / md5[:2] / md5[2:]):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def resolve_snapshot(data_path, filename="weather_data.csv"):
+    """
+    Find the latest versioned copy of a dataset without touching it.
+
+    Returns the path to read and its version. When the file is tracked by DVC
+    the immutable cache object is used, so a concurrent ingestion rewriting
+    the working copy can't be observed half-way.
+    """
+    data_file = Path(data_path) / filename
+    pointer = data_file.with_name(data_file.name + ".dvc")
+
+    if pointer.is_file():
+        with open(pointer) as f:
+            outs = yaml.safe_load(f).get("outs", [])
+        md5 = outs[0].get("md5") if outs else None
+        dvc_root = _find_dvc_root(data_file.parent.resolve())
+        if md5 and dvc_root is not None:
+            cached = _cache_object(dvc_root, md5)
+            if cached is not None:
+                return cached, md5
+        logger.warning(f"DVC cache object for {data_file} not found, reading the working copy.")
+
+    stat = data_file.stat()
+    return data_file, f"mtime-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _cached_or_working(path: Path, md5):
+    """Immutable DVC cache object of a file when available, the file itself otherwise."""
+    dvc_root = _find_dvc_root(path.parent.resolve())
+    cached = _cache_object(dvc_root, md5) if md5 and dvc_root is not None else None
+    return cached or path
+
+
+def read_partition_manifest(partitions_dir):
+    """Manifest of a partitioned dataset as versioned by DVC, and its version."""
+    manifest_path, version = resolve_snapshot(Path(partitions_dir), "manifest.json")
+    with open(manifest_path) as f:
+        return json.load(f), version
+
+
+def iter_partitions(partitions_dir, manifest=None):
+    """
+    Yield the monthly partitions of a dataset one at a time, oldest first.
+
+    Each partition is read from the DVC cache by the md5 the manifest
+    recorded, so a partition rewritten after the manifest was read is never
+    mixed into the snapshot.
+    """
+    partitions_dir = Path(partitions_dir)
+    if manifest is None:
+        manifest, _ = read_partition_manifest(partitions_dir)
+    for month in sorted(manifest["partitions"]):
+        entry = manifest["partitions"][month]
+        yield pd.read_parquet(_cached_or_working(partitions_dir / entry["file"], entry.get("md5")))
+
+
+def load_partitioned_snapshot(partitions_dir):
+    """Read a dataset versioned as monthly partitions, as listed by its manifest."""
+    manifest, version = read_partition_manifest(partitions_dir)
+    frames = list(iter_partitions(partitions_dir, manifest))
+    data = pd.concat(frames).sort_index() if frames else pd.DataFrame()
+    return data, version
+
+
+def hourly_features_path(data_path, location=None):
+    return Path(data_path) / location_filename(location, "parquet", prefix="hourly_features")
+
+
+def training_inputs(dataset_path, data_path, location=None):
+    """Files a training reads, for its stage cache key: the dataset, and the hourly features joined to it."""
+    inputs = [dataset_path]
+    if USE_HOURLY_FEATURES and hourly_features_path(data_path, location).is_file():
+        inputs.append(hourly_features_path(data_path, location))
+    return inputs
+
+
+def join_hourly_features(data, data_path, location=None):
+    """Add the daily aggregates of the hourly ingestion, days without them are left empty."""
+    path = hourly_features_path(data_path, location)
+    if not path.is_file():
+        logger.warning(f"No hourly features at {path}, run the hourly ingestion to backfill them.")
+        return data
+    features = pd.read_parquet(path)
+    if data.index.tz is None:
+        features.index = features.index.tz_convert("UTC").tz_localize(None)
+    return data.join(features[features.columns.difference(data.columns)], how="left")
+
+
+def load_snapshot(data_path, filename="weather_data.csv", location=None):
+    """Read the latest stored version of the weather dataset, read-only."""
+    # Partitioned versions cover the whole history, prefer them when present
+    partitions_dir = Path(data_path) / "partitions" / location_key(location)
+    if (partitions_dir / "manifest.json").is_file():
+        data, version = load_partitioned_snapshot(partitions_dir)
+        logger.info(f"Loaded partitioned snapshot {version} for {location_key(location)} ({len(data)} rows)")
+        return (join_hourly_features(data, data_path, location) if USE_HOURLY_FEATURES else data), version
+
+    path, version = resolve_snapshot(data_path, filename)
+
+    # The Arrow hand-off written with that same version skips CSV parsing
+    arrow_path = Path(data_path) / Path(filename).with_suffix(".arrow").name
+    data = read_if_source(arrow_path, version) if arrow_path.is_file() else None
+    if data is None:
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+    logger.info(f"Loaded snapshot {version} of {filename} ({len(data)} rows)")
+    return (join_hourly_features(data, data_path, location) if USE_HOURLY_FEATURES else data), version
@@ -16,9 +16,13 @@ def build_fourier(index, freq=365.25, order=2):
         out[f"cos_{freq}_{i}"] = np.cos(i*k)
     return pd.DataFrame(out, index=index)
 
-def fetch_and_prepare_data(start_date, end_date):
-    raw_df = get_weather_data(start_date=start_date, end_date=end_date)
+def prepare_features(raw_df):
+    """Calendar and Fourier features the served model expects."""
     raw_df = raw_df.sort_index().dropna()
     raw_df['day_of_year'] = raw_df.index.dayofyear
     fourier_features = build_fourier(raw_df.index)
     return pd.concat([raw_df, fourier_features], axis=1)
+
+def fetch_and_prepare_data(start_date, end_date):
+    raw_df = get_weather_data(start_date=start_date, end_date=end_date)
+    return prepare_features(raw_df)
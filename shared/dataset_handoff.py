@@ -0,0 +1,87 @@
+import os
+import hashlib
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+parent_dir = Path(__file__).resolve().parents[1]
+DATA_PATH = parent_dir / "data"
+HANDOFF_FILENAME = "weather_data.arrow"
+XCOM_KEY = "weather_dataset"
+
+
+def file_digest(path, algorithm="sha256", chunk_size=1 << 20):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_dataset(df: pd.DataFrame, data_dir=DATA_PATH, filename=HANDOFF_FILENAME, source_md5=None):
+    """
+    Write the typed frame once as an uncompressed Arrow IPC file.
+
+    Downstream tasks memory-map it instead of re-parsing the CSV, so they all
+    see the same dtypes. `source_md5` records the md5 of the CSV written from
+    the same frame, which lets readers match it with the DVC-tracked version.
+    """
+    # Same float64 columns the CSV path reads back, float32 would fail the suite's type checks
+    float32_columns = df.select_dtypes("float32").columns
+    if len(float32_columns):
+        df = df.astype({col: "float64" for col in float32_columns})
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = {**(table.schema.metadata or {}),
+                b"source_md5": (source_md5 or "").encode("utf-8")}
+    table = table.replace_schema_metadata(metadata)
+
+    path = Path(data_dir) / filename
+    tmp_path = path.with_name(f".{filename}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    return {"filename": filename, "content_hash": file_digest(path), "rows": table.num_rows}
+
+
+def read_if_source(path, md5):
+    """Memory-map the Arrow file only if it was written alongside the CSV with this md5."""
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if metadata.get(b"source_md5", b"").decode("utf-8") != md5:
+            return None
+        return reader.read_all().to_pandas()
+
+
+def read_dataset(path, expected_hash=None):
+    """Memory-map an Arrow hand-off file back into the typed frame."""
+    if expected_hash is not None and file_digest(path) != expected_hash:
+        raise ValueError(f"{path} does not match the content hash handed off by the fetch task.")
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def push_dataset(ti, dataset):
+    ti.xcom_push(key=XCOM_KEY, value=dataset)
+
+
+def handed_off_path(ti, task_id="DataFetching", data_dir=DATA_PATH):
+    dataset = ti.xcom_pull(task_ids=task_id, key=XCOM_KEY)
+    if not dataset:
+        raise ValueError("No dataset found in XCom. Ensure the data fetching task is executed before this task.")
+    return Path(data_dir) / dataset["filename"], dataset["content_hash"]
+
+
+def load_handed_off(ti, task_id="DataFetching", data_dir=DATA_PATH):
+    """Load the frame written by the fetch task, checked against its content hash."""
+    path, content_hash = handed_off_path(ti, task_id, data_dir)
+    df = read_dataset(path, expected_hash=content_hash)
+    logger.info(f"Loaded {len(df)} rows from {path.name} ({content_hash[:12]})")
+    return df
@@ -0,0 +1,164 @@
+import os
+import json
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from shared.locations import location_key
+
+parent_dir = Path(__file__).resolve().parents[1]
+FORECAST_STORE_PATH = Path(os.getenv("FORECAST_STORE_PATH", parent_dir / "data" / "forecasts.sqlite"))
+# Forecasts are materialised daily, older ones are served as persistence forecasts
+FORECAST_MAX_AGE = timedelta(hours=float(os.getenv("FORECAST_MAX_AGE_HOURS", "36")))
+# A forecast whose first day is further back than this was made from an old snapshot,
+# however recently it was stored
+FORECAST_MAX_ORIGIN_LAG = timedelta(days=float(os.getenv("FORECAST_MAX_ORIGIN_LAG_DAYS", "2")))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    location TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    generated_at TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    forecast TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS explanations (
+    run_id TEXT NOT NULL,
+    location TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    PRIMARY KEY (run_id, location, origin)
+)
+"""
+
+
+def _connect(path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def save_forecast(location, forecast: pd.Series, run_id, generated_at=None, path=FORECAST_STORE_PATH):
+    """Replace the stored forecast of a location, one row per location."""
+    generated_at = generated_at or datetime.now(timezone.utc)
+    payload = json.dumps({
+        "dates": [str(date) for date in forecast.index],
+        "values": [float(value) for value in forecast.to_numpy()],
+    })
+    with _connect(path) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO forecasts (location, run_id, generated_at, origin, forecast) VALUES (?, ?, ?, ?, ?)",
+            (location_key(location), str(run_id), generated_at.isoformat(), str(forecast.index[0]), payload),
+        )
+    connection.close()
+
+
+def load_forecast(location=None, path=FORECAST_STORE_PATH):
+    """Stored forecast of a location as {location, run_id, generated_at, origin, forecast}, None if there is none."""
+    if not Path(path).is_file():
+        return None
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT run_id, generated_at, origin, forecast FROM forecasts WHERE location = ?",
+            (location_key(location),),
+        ).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+
+    run_id, generated_at, origin, payload = row
+    payload = json.loads(payload)
+    return {
+        "location": location_key(location),
+        "run_id": run_id,
+        "generated_at": datetime.fromisoformat(generated_at),
+        "origin": pd.Timestamp(origin),
+        "forecast": pd.Series(payload["values"], index=pd.to_datetime(payload["dates"]), name="predicted_rain (mm)"),
+    }
+
+
+def save_explanations(run_id, explanations, path=FORECAST_STORE_PATH):
+    """
+    Store the feature contributions of the forecasts of a model run.
+
+    `explanations` maps a location to {origin, dates, features, base_values,
+    contributions}, contributions being one list per forecast day.
+    """
+    with _connect(path) as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO explanations (run_id, location, origin, explanation) VALUES (?, ?, ?, ?)",
+            [(str(run_id), location_key(location), str(explanation["origin"]), json.dumps(explanation))
+             for location, explanation in explanations.items()],
+        )
+    connection.close()
+
+
+def has_explanation(run_id, location=None, origin=None, path=FORECAST_STORE_PATH):
+    if not Path(path).is_file():
+        return False
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT 1 FROM explanations WHERE run_id = ? AND location = ? AND origin = ?",
+            (str(run_id), location_key(location), str(origin)),
+        ).fetchone()
+    finally:
+        connection.close()
+    return row is not None
+
+
+def load_explanation(run_id, location=None, path=FORECAST_STORE_PATH):
+    """
+    Feature contributions of the latest forecast of a location by a model run, None if not computed.
+
+    Returns {origin, dates, features, base_values, contributions} with contributions
+    as a frame of one row per forecast day and one column per feature.
+    """
+    if not Path(path).is_file():
+        return None
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT explanation FROM explanations WHERE run_id = ? AND location = ? ORDER BY origin DESC LIMIT 1",
+            (str(run_id), location_key(location)),
+        ).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+
+    explanation = json.loads(row[0])
+    explanation["contributions"] = pd.DataFrame(explanation["contributions"], columns=explanation["features"],
+                                                index=pd.to_datetime(explanation["dates"]))
+    return explanation
+
+
+def top_contributions(explanation, day=None, n=10):
+    """The `n` largest contributions, by absolute value, to the forecast of `day` (the rainiest by default)."""
+    contributions = explanation["contributions"]
+    if day is None:
+        day = (contributions.sum(axis=1) + explanation["base_values"]).idxmax()
+    row = contributions.loc[day]
+    return day, row.reindex(row.abs().sort_values(ascending=False).index[:n]).rename("contribution (mm)")
+
+
+def is_stale(record, max_age=FORECAST_MAX_AGE, max_origin_lag=FORECAST_MAX_ORIGIN_LAG, now=None):
+    """Stale when stored too long ago, or when its first forecast day is too far in the past."""
+    now = now or datetime.now(timezone.utc)
+    if record is None or now - record["generated_at"] > max_age:
+        return True
+    origin = record["origin"]
+    origin = origin.tz_localize("UTC") if origin.tzinfo is None else origin
+    return pd.Timestamp(now).normalize() - origin.normalize() > max_origin_lag
+
+
+def persistence_forecast(last_values: pd.Series, horizon: int):
+    """Simple persistence forecast: repeat last known value (or mean)"""
+    last = last_values.iloc[-1]
+    return pd.Series([last]*horizon, index=[last_values.index[-1] + timedelta(days=i) for i in range(1,horizon+1)])
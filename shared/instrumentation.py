@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import logging
+import cProfile
+import functools
+import threading
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger("pipeline.instrumentation")
+
+# Opt-in extras, both have a noticeable overhead
+PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR")
+TRACEMALLOC = os.getenv("PIPELINE_TRACEMALLOC", "0") == "1"
+# Stage metrics go to the active MLflow run, or to their own run in this experiment
+METRICS_EXPERIMENT = os.getenv("PIPELINE_METRICS_EXPERIMENT")
+
+_current_stage = ContextVar("current_stage", default=None)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+# Traced peak, in bytes, of each enclosing stage: one reset_peak per stage would lose the outer peaks
+_tracemalloc_peaks = ContextVar("tracemalloc_peaks", default=())
+# Profiler of the outermost profiled stage of this context
+_active_profiler = ContextVar("active_profiler", default=None)
+
+
+def current_stage():
+    """Metrics record of the stage running in this context, if any."""
+    return _current_stage.get()
+
+
+def set_rows(rows_in=None, rows_out=None):
+    stage = current_stage()
+    if stage is not None:
+        if rows_in is not None:
+            stage["rows_in"] = int(rows_in)
+        if rows_out is not None:
+            stage["rows_out"] = int(rows_out)
+
+
+def record_cache_hit(hits=1, misses=0):
+    stage = current_stage()
+    if stage is not None:
+        stage["cache_hits"] += hits
+        stage["cache_misses"] += misses
+
+
+def stage_metrics(stage):
+    """Numeric metrics of a stage record, named `<stage>.<metric>` for MLflow."""
+    return {f"{stage['stage']}.{key}": value for key, value in stage.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+def _peak_rss_mb():
+    """Highest RSS of the process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _rss_mb():
+    """Current RSS of the process, None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+    outer = _tracemalloc_peaks.get()
+    if outer:
+        # The enclosing stage keeps the peak it reached so far
+        outer[-1][0] = max(outer[-1][0], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    return _tracemalloc_peaks.set(outer + ([0],))
+
+
+def _stop_tracemalloc(token):
+    global _tracemalloc_users
+    peak = max(_tracemalloc_peaks.get()[-1][0], tracemalloc.get_traced_memory()[1])
+    _tracemalloc_peaks.reset(token)
+    outer = _tracemalloc_peaks.get()
+    if outer:
+        outer[-1][0] = max(outer[-1][0], peak)
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def _emit_mlflow(stage):
+    """Log the stage metrics to MLflow without ever importing it in processes that don't use it."""
+    if "mlflow" not in sys.modules and not METRICS_EXPERIMENT:
+        return
+    try:
+        import mlflow
+
+        metrics = stage_metrics(stage)
+        if mlflow.active_run() is not None:
+            mlflow.log_metrics(metrics)
+        elif METRICS_EXPERIMENT:
+            mlflow.set_experiment(METRICS_EXPERIMENT)
+            with mlflow.start_run(run_name=stage["stage"], tags={"pipeline_stage": stage["stage"]}):
+                mlflow.log_metrics(metrics)
+    except Exception as e:
+        logger.warning(f"Could not log stage metrics to MLflow: {e}")
+
+
+@contextmanager
+def instrument_stage(name, rows_in=None):
+    """
+    Measure one pipeline stage.
+
+    Records wall and CPU time, how much the stage grew the RSS and its peak,
+    the tracemalloc peak (PIPELINE_TRACEMALLOC=1), rows in and out and cache
+    hits, then emits them as a structured log line and as MLflow metrics.
+    With PIPELINE_PROFILE_DIR set, a cProfile dump of the outermost stage,
+    nested stages included, is written there.
+    """
+    stage = {"stage": name, "rows_in": rows_in, "rows_out": None, "cache_hits": 0, "cache_misses": 0}
+    token = _current_stage.set(stage)
+    profiler = profiler_token = tracemalloc_token = None
+    rss_start, peak_rss_start = _rss_mb(), _peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    try:
+        # Only one profiler can be enabled at a time, nested stages are part of the outermost profile
+        if PROFILE_DIR and _active_profiler.get() is None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                profiler_token = _active_profiler.set(profiler)
+            except ValueError as e:
+                logger.warning(f"Stage {name} not profiled, another profiler is active: {e}")
+                profiler = None
+        if TRACEMALLOC:
+            tracemalloc_token = _start_tracemalloc()
+        yield stage
+        stage["status"] = "success"
+    except BaseException:
+        stage["status"] = "failed"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _active_profiler.reset(profiler_token)
+        stage["wall_seconds"] = time.perf_counter() - wall_start
+        stage["cpu_seconds"] = time.process_time() - cpu_start
+        # ru_maxrss is the peak of the whole process: only how much the stage raised it is its own
+        peak_rss = _peak_rss_mb()
+        stage["peak_rss_increase_mb"] = None if peak_rss is None else peak_rss - peak_rss_start
+        rss = _rss_mb()
+        stage["rss_increase_mb"] = None if rss is None or rss_start is None else rss - rss_start
+        if tracemalloc_token is not None:
+            stage["tracemalloc_peak_mb"] = _stop_tracemalloc(tracemalloc_token)
+        _current_stage.reset(token)
+        if profiler is not None:
+            try:
+                Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+                profile_path = Path(PROFILE_DIR) / f"{name}-{int(time.time())}.prof"
+                profiler.dump_stats(str(profile_path))
+                stage["profile"] = str(profile_path)
+            except OSError as e:
+                logger.warning(f"Could not write the profile of {name}: {e}")
+
+        logger.info(json.dumps({"event": "stage_metrics", **stage}, default=str))
+        _emit_mlflow(stage)
+
+
+def _row_count(value):
+    if hasattr(value, "shape") and len(getattr(value, "shape", ())) >= 1:
+        return value.shape[0]
+    return None
+
+
+def instrumented(name=None):
+    """Decorator running a function inside `instrument_stage`, rows taken from DataFrame args and result."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = next((_row_count(arg) for arg in (*args, *kwargs.values())
+                            if _row_count(arg) is not None), None)
+            with instrument_stage(stage_name, rows_in=rows_in) as stage:
+                result = func(*args, **kwargs)
+                if stage["rows_out"] is None:
+                    stage["rows_out"] = _row_count(result)
+                return result
+        return wrapper
+    return decorator
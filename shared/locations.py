@@ -0,0 +1,193 @@
+import os
+import json
+
+# Locations the pipeline forecasts for, keyed by slug. `importance` weighs a
+# location when retraining jobs compete for the same workers.
+LOCATIONS = {
+    "brazzaville": {"name": "Brazzaville", "latitude": -4.2661, "longitude": 15.2832, "importance": 1.0},
+    "pointe_noire": {"name": "Pointe-Noire", "latitude": -4.7692, "longitude": 11.8664, "importance": 0.8},
+    "dolisie": {"name": "Dolisie", "latitude": -4.1983, "longitude": 12.6667, "importance": 0.5},
+}
+
+DEFAULT_LOCATION = "brazzaville"
+
+# Extra locations can be registered without a code change
+LOCATIONS_FILE = os.getenv("LOCATIONS_FILE")
+if LOCATIONS_FILE and os.path.exists(LOCATIONS_FILE):
+    with open(LOCATIONS_FILE) as f:
+        LOCATIONS.update(json.load(f))
+
+
+def location_slugs():
+    return list(LOCATIONS)
+
+
+def get_location(location=None):
+    """Registry entry of a location, the default one when `location` is None."""
+    slug = location or DEFAULT_LOCATION
+    try:
+        return LOCATIONS[slug]
+    except KeyError:
+        raise ValueError(f"Unknown location {slug}, expected one of {location_slugs()}.")
+
+
+def location_filename(location=None, extension="csv", prefix="weather_data"):
+    """Data file of a location; the default location keeps the historical name."""
+    if location is None:
+        return f"{prefix}.{extension}"
+    return f"{prefix}_{location}.{extension}"
+
+
+def location_key(location=None):
+    """
+    Key of a location's records in the stores. None is the dataset of the
+    single-location pipeline, kept apart from the registered slugs like its
+    files and partitions.
+    """
+    return location or "default"
+
+
+def cut_off_key(location=None):
+    """Environment key holding the training cut-off date of a location."""
+    return "CUT_OFF_DATE" if location is None else f"CUT_OFF_DATE_{location.upper()}"
+
+
+def save_cut_off_date(location, cut_off_date, env_path):
+    """
+    Record the training cut-off date of a location in the .env file.
+
+    set_key rewrites the whole file, so concurrent trainings (the retrain
+    scheduler's workers) take an exclusive lock or they lose each other's keys.
+    """
+    import fcntl
+    from dotenv import set_key
+
+    with open(f"{env_path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            set_key(env_path, cut_off_key(location), cut_off_date)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# ---------------------
+# Spatial index
+# ---------------------
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _unit_vectors(latitudes, longitudes):
+    """Points on the unit sphere; their chord distance grows with the great-circle distance."""
+    import numpy as np
+
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_latitudes = np.cos(latitudes)
+    return np.stack([cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes)], axis=-1)
+
+
+def _normalise_name(name):
+    return " ".join(str(name).lower().replace("-", " ").replace("_", " ").split())
+
+
+class LocationIndex:
+    """
+    Nearest-location lookups over the registry, by coordinates or by name.
+
+    Locations are stored as unit vectors in a KD-tree: the straight-line
+    distance between two of them orders points like the haversine distance,
+    so batched nearest-k and radius queries stay logarithmic in the size of
+    the registry and the results are converted back to kilometres.
+    Names, slugs and the optional `aliases` of an entry (districts, other
+    spellings) resolve to the entry's slug.
+    """
+
+    def __init__(self, locations=None):
+        from scipy.spatial import cKDTree
+
+        locations = LOCATIONS if locations is None else locations
+        self.slugs = list(locations)
+        self.tree = cKDTree(_unit_vectors([locations[slug]["latitude"] for slug in self.slugs],
+                                          [locations[slug]["longitude"] for slug in self.slugs]))
+        self.aliases = {}
+        for slug, entry in locations.items():
+            for name in [slug, entry.get("name", slug), *entry.get("aliases", [])]:
+                self.aliases.setdefault(_normalise_name(name), slug)
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def nearest(self, latitudes, longitudes, k=1):
+        """
+        (distances in km, slugs) of the `k` locations nearest to each point.
+
+        Takes scalars or arrays; both results have shape (points, k).
+        """
+        import numpy as np
+
+        k = min(k, len(self.slugs))
+        chords, positions = self.tree.query(np.atleast_2d(_unit_vectors(latitudes, longitudes)), k=k)
+        chords, positions = chords.reshape(-1, k), positions.reshape(-1, k)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+        return distances, np.asarray(self.slugs, dtype=object)[positions]
+
+    def within(self, latitudes, longitudes, radius_km):
+        """[(slug, distance in km), ...] nearest first, of the locations within `radius_km` of each point."""
+        import numpy as np
+
+        points = np.atleast_2d(_unit_vectors(latitudes, longitudes))
+        chord = 2 * np.sin(min(radius_km / (2 * EARTH_RADIUS_KM), np.pi / 2))
+        results = []
+        for point, positions in zip(points, self.tree.query_ball_point(points, chord)):
+            chords = np.linalg.norm(self.tree.data[positions] - point, axis=1)
+            distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+            results.append([(self.slugs[positions[i]], float(distances[i])) for i in np.argsort(distances)])
+        return results
+
+    def lookup(self, name):
+        """Slug of a registered name, slug or alias, None when unknown."""
+        return self.aliases.get(_normalise_name(name))
+
+
+_location_index = None
+
+
+def get_location_index():
+    """Index over the registry, built on first use."""
+    global _location_index
+    if _location_index is None or len(_location_index) != len(LOCATIONS):
+        _location_index = LocationIndex()
+    return _location_index
+
+
+def resolve_location(location=None, max_distance_km=None):
+    """
+    Slug of the registered location a query refers to.
+
+    `location` is a slug, a name or alias, or a (latitude, longitude) pair
+    mapped to the nearest location; None stays None (the default location).
+    With `max_distance_km`, a point farther than that from every location
+    is rejected.
+    """
+    if location is None:
+        return None
+    if isinstance(location, str):
+        if location in LOCATIONS:
+            return location
+        slug = get_location_index().lookup(location)
+        if slug is None:
+            raise ValueError(f"Unknown location {location}, expected one of {location_slugs()}.")
+        return slug
+
+    import numpy as np
+
+    # Any pair of numbers is a point: tuple, list or numpy array
+    coordinates = np.asarray(location, dtype=float).ravel()
+    if coordinates.shape != (2,):
+        raise ValueError(f"Expected a location name or a (latitude, longitude) pair, got {location!r}.")
+    latitude, longitude = coordinates
+    distances, slugs = get_location_index().nearest(latitude, longitude)
+    if max_distance_km is not None and distances[0, 0] > max_distance_km:
+        raise ValueError(f"No location within {max_distance_km} km of {location}, "
+                         f"the nearest is {slugs[0, 0]} at {distances[0, 0]:.0f} km.")
+    return slugs[0, 0]
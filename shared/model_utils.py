@@ -1,4 +1,5 @@
 import os
+import threading
 import mlflow
 import pandas as pd
 from pathlib import Path
@@ -7,6 +8,9 @@ from datetime import timedelta
 from dotenv import load_dotenv
 
 from shared.variables import  past_covariate_cols , target_col
+from shared.instrumentation import instrumented
+from shared.forecast_store import persistence_forecast
+from shared.locations import resolve_location
 from darts.models import CatBoostModel
 from darts import TimeSeries
 
@@ -19,33 +23,83 @@ load_dotenv()
 experiment_name = os.getenv("EXPERIMENT_NAME")
 mlflow_tracking_uri = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
 
-client = MlflowClient(tracking_uri=mlflow_tracking_uri)
-experiment = client.get_experiment_by_name(experiment_name)
+_client = None
+_experiment = None
+# The default model and its run id, loaded on first use so importing this
+# module costs no MLflow round trip or model download
+_default = None
+_default_lock = threading.Lock()
 
-    
-
-# Get the latest run
-runs = client.search_runs(
-    experiment_ids=[experiment.experiment_id],
-    order_by=["start_time DESC"],
-    max_results=1
-)
-
-run_id = runs[0].info.run_id
-print(f"Latest run_id: {run_id}")
+# Per-location models and their run ids, loaded on first use
+location_models = {}
+location_run_ids = {}
 
-# Download and load
-local_dir = mlflow.artifacts.download_artifacts(
-    run_id=run_id,
-artifact_path="catboost_model.pkl",
-    tracking_uri=mlflow_tracking_uri
-)
-model = CatBoostModel.load(str(Path(local_dir)))
 
+def get_client():
+    """MLflow client and the experiment the served models are logged in."""
+    global _client, _experiment
+    if _client is None:
+        _client = MlflowClient(tracking_uri=mlflow_tracking_uri)
+        _experiment = _client.get_experiment_by_name(experiment_name)
+    return _client, _experiment
 
-def safe_predict_with_model( weather_df: pd.DataFrame, horizon=7 , start= 8):
 
-    """Try to predict with darts model; handle exceptions."""
+def _load_run_model(run_id):
+    local_dir = mlflow.artifacts.download_artifacts(
+        run_id=run_id,
+        artifact_path="catboost_model.pkl",
+        tracking_uri=mlflow_tracking_uri
+    )
+    return CatBoostModel.load(str(Path(local_dir)))
+
+
+def get_model():
+    """(run_id, model) of the latest run, downloaded once per process."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            client, experiment = get_client()
+            runs = client.search_runs(
+                experiment_ids=[experiment.experiment_id],
+                order_by=["start_time DESC"],
+                max_results=1
+            )
+            run_id = runs[0].info.run_id
+            logging.info(f"Latest run_id: {run_id}")
+            _default = (run_id, _load_run_model(run_id))
+    return _default
+
+
+def load_location_model(location):
+    """Load the latest model trained for a location (runs tagged with `location`)."""
+    if location not in location_models:
+        client, experiment = get_client()
+        location_runs = client.search_runs(
+            experiment_ids=[experiment.experiment_id],
+            filter_string=f"tags.location = '{location}'",
+            order_by=["start_time DESC"],
+            max_results=1
+        )
+        if not location_runs:
+            raise ValueError(f"No trained model found for location {location}.")
+        location_models[location] = _load_run_model(location_runs[0].info.run_id)
+        location_run_ids[location] = location_runs[0].info.run_id
+    return location_models[location]
+
+
+def latest_model(location=None):
+    """(run_id, model) of the model serving a location, the default model when `location` is None."""
+    if location is None:
+        return get_model()
+    location_model = load_location_model(location)
+    return location_run_ids[location], location_model
+
+
+@instrumented("Prediction")
+def safe_predict_with_model( weather_df: pd.DataFrame, horizon=7 , start= 8, location=None):
+
+    """Try to predict with darts model; handle exceptions.
+    `location` may be a name, alias or (latitude, longitude) pair, served by the nearest location's model."""
     target_series = TimeSeries.from_dataframe(
         weather_df,
         value_cols=[target_col], )
@@ -58,7 +112,8 @@ def safe_predict_with_model( weather_df: pd.DataFrame, horizon=7 , start= 8):
     )
 
     try:
-        pred = model.predict(horizon,series=target_series, past_covariates=past_covariates_ts)
+        _, location_model = latest_model(resolve_location(location))
+        pred = location_model.predict(horizon,series=target_series, past_covariates=past_covariates_ts)
 
         # convert to pandas series
         if hasattr(pred, "to_dataframe"):
@@ -76,9 +131,3 @@ def safe_predict_with_model( weather_df: pd.DataFrame, horizon=7 , start= 8):
     except Exception as e:
         logging.error(f"Model prediction failed: {e}")
         return None
-
-def persistence_forecast(last_values: pd.Series, horizon: int):
-    """Simple persistence forecast: repeat last known value (or mean)"""
-    last = last_values.iloc[-1]
-    return pd.Series([last]*horizon, index=[last_values.index[-1] + timedelta(days=i) for i in range(1,horizon+1)])
-
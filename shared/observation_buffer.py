@@ -0,0 +1,314 @@
+"""
+Recent observations per location, in preallocated ring buffers.
+
+Inference only needs the last `lags_past_covariates` days of covariates and
+the last `lags` targets, so each location keeps its most recent `capacity`
+prepared rows (target first, then the past covariates) in a fixed float32
+array. New days overwrite the oldest ones, and the features of a forecast
+are copied from the buffer straight into a preallocated row in darts'
+layout, so a prediction builds no DataFrame or TimeSeries.
+
+Buffers are persisted as one .npz file per location. The versioning task
+appends the days each fetch brought, so materialisation never reloads a
+snapshot once a location's buffer exists.
+"""
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from shared.locations import location_filename, location_key
+from shared.variables import past_covariate_cols, target_col
+
+# Days kept per location, enough for the longest lag window
+OBSERVATION_BUFFER_DAYS = int(os.getenv("OBSERVATION_BUFFER_DAYS", "32"))
+OBSERVATION_BUFFERS_PATH = Path(os.getenv("OBSERVATION_BUFFERS_PATH",
+                                          Path(__file__).resolve().parents[1] / "data" / "observation_buffers"))
+FOURIER_FREQ = 365.25
+FOURIER_ORDER = 2
+
+_ONE_DAY = np.timedelta64(1, "D")
+
+
+def _utc_day(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.to_datetime64().astype("datetime64[D]")
+
+
+class LocationBuffer:
+    """
+    Ring buffer of the last `capacity` days of one location, one row per day.
+
+    Days are contiguous: a day skipped by ingestion is stored as a NaN row,
+    so the position of a row always gives its lag.
+    """
+
+    __slots__ = ("capacity", "values", "end", "size", "last_day")
+
+    def __init__(self, capacity, n_columns):
+        self.capacity = capacity
+        self.values = np.full((capacity, n_columns), np.nan, dtype=np.float32)
+        # Position the next day is written to
+        self.end = 0
+        self.size = 0
+        self.last_day = None
+
+    def _write(self, row):
+        self.values[self.end] = row
+        self.end = (self.end + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def append(self, day, row):
+        """Store the row of `day`; a re-fetched day replaces its row, days older than the buffer are ignored."""
+        day = np.datetime64(day, "D")
+        if self.last_day is None:
+            self._write(row)
+        elif day <= self.last_day:
+            lag = int((self.last_day - day) / _ONE_DAY)
+            if lag < self.size:
+                self.values[(self.end - 1 - lag) % self.capacity] = row
+            return
+        else:
+            # Missing days keep their place as NaN rows
+            for _ in range(min(int((day - self.last_day) / _ONE_DAY) - 1, self.capacity)):
+                self._write(np.nan)
+            self._write(row)
+        self.last_day = day
+
+    def window(self, n, out, columns=slice(None)):
+        """Copy the last `n` days of `columns`, oldest first, into `out` of shape (n, columns)."""
+        if n > self.size:
+            raise ValueError(f"Only {self.size} days buffered, {n} requested.")
+        start = (self.end - n) % self.capacity
+        if start + n <= self.capacity:
+            np.copyto(out, self.values[start:start + n, columns])
+        else:
+            # The window wraps around the end of the array
+            head = self.capacity - start
+            np.copyto(out[:head], self.values[start:, columns])
+            np.copyto(out[head:], self.values[:n - head, columns])
+        return out
+
+    def save(self, path, **metadata):
+        """Write the buffer to `path` atomically, with `metadata` saved next to the rows."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, values=self.values, end=self.end, size=self.size,
+                     last_day=np.datetime64("NaT", "D") if self.last_day is None else self.last_day,
+                     **metadata)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """(buffer, metadata) read back from a file written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            values = data["values"]
+            buffer = cls(*values.shape)
+            buffer.values[:] = values
+            buffer.end = int(data["end"])
+            buffer.size = int(data["size"])
+            last_day = data["last_day"][()]
+            buffer.last_day = None if np.isnat(last_day) else last_day
+            metadata = {key: data[key] for key in data.files
+                        if key not in ("values", "end", "size", "last_day")}
+        return buffer, metadata
+
+
+def calendar_features(frame, start_day):
+    """Same features as `prepare_features`, with time counted in days from the first day of the snapshot."""
+    frame = frame.copy()
+    index = frame.index.tz_localize(None) if frame.index.tz is not None else frame.index
+    frame["day_of_year"] = index.dayofyear
+    k = 2 * np.pi * (1 / FOURIER_FREQ) * (index - pd.Timestamp(start_day)).days.to_numpy(dtype=np.float32)
+    for i in range(1, FOURIER_ORDER + 1):
+        frame[f"sin_{FOURIER_FREQ}_{i}"] = np.sin(i * k)
+        frame[f"cos_{FOURIER_FREQ}_{i}"] = np.cos(i * k)
+    return frame
+
+
+class ObservationStore:
+    """
+    Ring buffers of every served location and the features of their next forecast.
+
+    Rows hold `target_col` then `past_covariate_cols`, as produced by the
+    feature preparation of the model being served. Feature rows follow
+    darts' layout: the target lags, then the covariate lags lag-major and
+    oldest first.
+
+    A buffer missing from memory is read from `path`, where `save` writes it.
+    """
+
+    __slots__ = ("capacity", "columns", "lags", "lags_past_covariates", "path", "buffers", "start_days", "_lock")
+
+    def __init__(self, lags=1, lags_past_covariates=8, capacity=OBSERVATION_BUFFER_DAYS,
+                 columns=None, path=OBSERVATION_BUFFERS_PATH):
+        self.columns = columns or [target_col, *past_covariate_cols]
+        self.lags = lags
+        self.lags_past_covariates = lags_past_covariates
+        self.capacity = max(capacity, lags, lags_past_covariates)
+        self.path = Path(path)
+        self.buffers = {}
+        # First day of the snapshot each buffer was built from, the origin of its Fourier terms
+        self.start_days = {}
+        self._lock = threading.Lock()
+
+    @property
+    def n_features(self):
+        return self.lags + self.lags_past_covariates * (len(self.columns) - 1)
+
+    def feature_names(self):
+        """Names of the feature row, as darts names its lagged features."""
+        names = [f"{self.columns[0]}_target_lag{-lag}" for lag in range(self.lags, 0, -1)]
+        return names + [f"{col}_pastcov_lag{-lag}"
+                        for lag in range(self.lags_past_covariates, 0, -1)
+                        for col in self.columns[1:]]
+
+    def buffer_path(self, location):
+        return self.path / location_filename(location, "npz", prefix="observations")
+
+    def _load(self, location):
+        """Buffer persisted for a location, None when there is none or it holds other columns."""
+        path = self.buffer_path(location)
+        if not path.is_file():
+            return None
+        buffer, metadata = LocationBuffer.load(path)
+        if buffer.capacity != self.capacity or metadata["columns"].tolist() != self.columns:
+            return None
+        self.start_days[location] = metadata["start_day"][()]
+        return buffer
+
+    def _buffer(self, location, create=True):
+        buffer = self.buffers.get(location)
+        if buffer is None:
+            with self._lock:
+                buffer = self.buffers.get(location) or self._load(location)
+                if buffer is None and create:
+                    buffer = LocationBuffer(self.capacity, len(self.columns))
+                if buffer is not None:
+                    self.buffers[location] = buffer
+        return buffer
+
+    def save(self, location):
+        self.buffers[location].save(self.buffer_path(location), columns=np.array(self.columns),
+                                    start_day=self.start_days[location])
+
+    def ingest(self, location, frame: pd.DataFrame):
+        """Append the days of `frame` not buffered yet, and replace the re-fetched ones. Returns the days written."""
+        if frame.empty:
+            return 0
+        buffer = self._buffer(location)
+        index = frame.index.tz_localize(None) if frame.index.tz is not None else frame.index
+        days = index.to_numpy(dtype="datetime64[D]")
+        # Only the days that can still be in the buffer
+        keep = days > days.max() - self.capacity * _ONE_DAY
+        rows = frame[self.columns].to_numpy(dtype=np.float32)[keep]
+        for day, row in zip(days[keep], rows):
+            buffer.append(day, row)
+        return int(keep.sum())
+
+    def update(self, location, raw: pd.DataFrame, start_day):
+        """
+        Append the newly fetched days of a raw `frame` to a location's buffer, and persist it.
+
+        Only the days after the buffered ones, and the re-fetched days still
+        in the buffer, go through feature preparation. `start_day` is the
+        first day of the location's snapshot: when it moves, the Fourier terms
+        shift and the buffer is rebuilt from `raw`. Returns the days written.
+        """
+        start_day = _utc_day(start_day)
+        buffer = self._buffer(location, create=False)
+        if buffer is None or self.start_days.get(location) != start_day:
+            buffer = self.buffers[location] = LocationBuffer(self.capacity, len(self.columns))
+            self.start_days[location] = start_day
+
+        index = raw.index.tz_localize(None) if raw.index.tz is not None else raw.index
+        days = index.to_numpy(dtype="datetime64[D]")
+        oldest = days.max() - self.capacity * _ONE_DAY if len(days) else None
+        if buffer.last_day is not None and oldest is not None:
+            oldest = max(oldest, buffer.last_day - buffer.size * _ONE_DAY)
+        # prepare_features drops incomplete days, so they are left out of the lags too
+        new = raw[days > oldest].dropna() if oldest is not None else raw.iloc[:0]
+        written = self.ingest(location, calendar_features(new.sort_index(), start_day))
+        self.save(location)
+        return written
+
+    def last_day(self, location):
+        buffer = self._buffer(location, create=False)
+        return None if buffer is None or buffer.last_day is None else pd.Timestamp(buffer.last_day)
+
+    def feature_row(self, location, out):
+        """Fill the preallocated `out` (n_features,) with the lag features of the next forecast of a location."""
+        buffer = self._buffer(location, create=False)
+        if buffer is None:
+            raise KeyError(f"No observations buffered for {location or 'the default location'}.")
+        buffer.window(self.lags, out[:self.lags].reshape(self.lags, 1), slice(0, 1))
+        buffer.window(self.lags_past_covariates,
+                      out[self.lags:].reshape(self.lags_past_covariates, len(self.columns) - 1),
+                      slice(1, None))
+        return out
+
+    def feature_matrix(self, locations, out=None):
+        """Feature rows of several locations, for one batched predict call."""
+        if out is None:
+            out = np.empty((len(locations), self.n_features), dtype=np.float32)
+        for i, location in enumerate(locations):
+            self.feature_row(location, out[i])
+        return out
+
+
+def native_regressor(model):
+    """Fitted estimator behind a darts regression model, or the model itself when it already is one."""
+    return getattr(model, "model", model)
+
+
+def predict_from_store(store: ObservationStore, locations, model, extra_features=None, out=None):
+    """
+    Next-days forecast of each location from its buffer, one predict call for them all.
+
+    `model` is a darts regression model or a native CatBoost booster, its
+    output is one column per forecast day. `extra_features` (locations,
+    k) are appended to each row, e.g. the coordinates the global model was
+    trained with.
+    """
+    n_extra = 0 if extra_features is None else extra_features.shape[1]
+    if out is None:
+        out = np.empty((len(locations), store.n_features + n_extra), dtype=np.float32)
+    store.feature_matrix(locations, out[:, :store.n_features])
+    if n_extra:
+        out[:, store.n_features:] = extra_features
+    return np.asarray(native_regressor(model).predict(out)).reshape(len(locations), -1)
+
+
+_store = None
+
+
+def get_observation_store():
+    """Store shared by the whole process, so buffers are only read from disk once."""
+    global _store
+    if _store is None:
+        _store = ObservationStore()
+    return _store
+
+
+def snapshot_start_day(data_path, location=None):
+    """First day of the partitioned snapshot of a location, as recorded by its manifest."""
+    from shared.data_snapshot import read_partition_manifest
+
+    manifest, _ = read_partition_manifest(Path(data_path) / "partitions" / location_key(location))
+    return min(entry["first_date"] for entry in manifest["partitions"].values())
+
+
+def update_observation_buffer(frame, data_path, location=None):
+    """Versioning side: add the days a fetch brought to the persisted buffer of a location."""
+    from shared.data_snapshot import join_hourly_features
+    from shared.variables import USE_HOURLY_FEATURES
+
+    if USE_HOURLY_FEATURES:
+        frame = join_hourly_features(frame, data_path, location)
+    return get_observation_store().update(location, frame, snapshot_start_day(data_path, location))
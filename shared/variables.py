@@ -1,3 +1,5 @@
+import os
+
 GLASS_CSS = """
 <style>
 :root{
@@ -96,3 +98,15 @@ past_covariate_cols = [
     "cos_365.25_1",
     "cos_365.25_2",
 ]
+
+# Daily aggregates of the hourly ingestion (includes/DataIngestion/hourly_features.py),
+# used as extra covariates by training and serving when USE_HOURLY_FEATURES=1
+hourly_covariate_cols = [
+    "rain_rate_max (mm/h)",
+    "pressure_tendency (hPa)",
+    "pressure_tendency_3h_max (hPa)",
+]
+
+USE_HOURLY_FEATURES = os.getenv("USE_HOURLY_FEATURES", "0") == "1"
+if USE_HOURLY_FEATURES:
+    past_covariate_cols = past_covariate_cols + hourly_covariate_cols